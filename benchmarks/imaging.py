@@ -0,0 +1,236 @@
+"""
+Benchmarks every imaging job exported from the function modules of `bot.utils.imaging`
+
+Jobs are called directly, without a discord context or the result cache,
+on a fixed corpus of generated static PNGs and animated GIFs.
+Every case runs in a fresh worker process so that the peak RSS it reports is its own
+
+Usage: python benchmarks/imaging.py [--filter NAME ...] [--repeat N] [--output FILE]
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Final, Optional
+from io import BytesIO
+import multiprocessing
+import importlib
+import argparse
+import platform
+import datetime
+import time
+import json
+import sys
+import os
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODULES: Final[tuple[str, ...]] = (
+    'pil_functions',
+    'wand_functions',
+    'cv_functions',
+    'colormap_filters',
+)
+STATIC_SIZES: Final[tuple[int, ...]] = (256, 512, 1024)
+# (size, frames)
+ANIMATED_SIZES: Final[tuple[tuple[int, int], ...]] = ((128, 10), (256, 30))
+SEED: Final[int] = 0
+
+# jobs that cannot run without a discord context
+SKIP: Final[dict[str, str]] = {
+    'image_info': 'needs a discord context',
+}
+
+
+def _color(name: str) -> Any:
+    from wand.color import Color
+    return Color(name)
+
+# keyword arguments of the jobs that have required ones, built in the worker
+KWARGS: Final[dict[str, Callable[[], dict[str, Any]]]] = {
+    'caption': lambda: {'text': 'when the benchmark is too slow'},
+    'colorize': lambda: {'color': _color('red')},
+    'replace_color': lambda: {'target': _color('white'), 'to': _color('red')},
+    'colordetect': lambda: {'color': _color('red')},
+    'apply_color_map': lambda: {'colormap': 'COLORMAP_JET'},
+}
+
+
+def _pattern(size: int, phase: float, rng: np.random.Generator) -> np.ndarray:
+    """A smooth gradient with rings and some noise, so that effects have both edges and flat areas"""
+    y, x = np.mgrid[0:size, 0:size] / size
+    rings = np.sin((np.hypot(x - 0.5, y - 0.5) * 24 + phase) * np.pi)
+
+    pixels = np.stack((x * 255, y * 255, (rings + 1) * 127.5), axis=-1)
+    pixels += rng.normal(0, 8, pixels.shape)
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+def build_corpus() -> dict[str, bytes]:
+    rng = np.random.default_rng(SEED)
+    corpus = {}
+
+    for size in STATIC_SIZES:
+        buffer = BytesIO()
+        Image.fromarray(_pattern(size, 0, rng)).save(buffer, 'PNG')
+        corpus[f'static-{size}'] = buffer.getvalue()
+
+    for size, n_frames in ANIMATED_SIZES:
+        frames = [Image.fromarray(_pattern(size, i / n_frames * 2, rng)) for i in range(n_frames)]
+
+        buffer = BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:], duration=50, loop=0)
+        corpus[f'animated-{size}x{n_frames}'] = buffer.getvalue()
+    return corpus
+
+
+def _use_assets(path: str) -> None:
+    from bot.utils import helpers
+    helpers.get_asset = lambda file: os.path.join(path, file)
+
+def _peak_rss() -> int:
+    if resource is not None:
+        # kilobytes on linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+    import psutil
+    return psutil.Process().memory_info().peak_wset
+
+def _output_size(result: Any) -> Optional[int]:
+    if hasattr(result, 'fp'):
+        return len(result.fp.getvalue())
+    elif isinstance(result, BytesIO):
+        return len(result.getvalue())
+    elif isinstance(result, (str, bytes)):
+        return len(result)
+    return None
+
+def _run_case(key: str, name: str, data: bytes, repeat: int, assets: Optional[str]) -> dict[str, Any]:
+    """Runs in a fresh worker, the first run is a warmup and is not timed"""
+    if assets:
+        _use_assets(assets)
+
+    from bot.utils.imaging.output import OutputOptions
+    from bot.utils.imaging.workers import get_job
+
+    job = get_job(key)
+    kwargs = KWARGS[name]() if name in KWARGS else {}
+    rss_before = _peak_rss()
+
+    timings = []
+    output_bytes = None
+    try:
+        for i in range(repeat + 1):
+            start = time.perf_counter()
+            result = job(None, BytesIO(data), (), kwargs, OutputOptions())
+            elapsed = time.perf_counter() - start
+
+            if i:
+                timings.append(elapsed * 1000)
+            output_bytes = _output_size(result)
+    except Exception as exc:
+        return {'error': f'{type(exc).__name__}: {exc}'}
+
+    p50, p95 = np.percentile(timings, [50, 95])
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'mean_ms': round(float(np.mean(timings)), 3),
+        'runs': len(timings),
+        'rss_before_bytes': rss_before,
+        'peak_rss_bytes': _peak_rss(),
+        'output_bytes': output_bytes,
+    }
+
+
+def collect_jobs(filters: list[str], assets: Optional[str]) -> tuple[list[tuple[str, str, str]], list[dict[str, str]]]:
+    """The `(module, name, key)` of every job to run, and the exported names that were skipped"""
+    if assets:
+        _use_assets(assets)
+
+    from bot.utils.imaging.workers import get_job
+
+    jobs, skipped = [], []
+    for module_name in MODULES:
+        try:
+            module = importlib.import_module(f'bot.utils.imaging.{module_name}')
+        except Exception as exc:
+            # e.g. ImageMagick not being installed
+            skipped.append({'effect': module_name, 'reason': f'import failed: {type(exc).__name__}: {exc}'})
+            continue
+
+        for name in module.__all__:
+            key = f'{module.__name__}:{name}'
+            effect = f'{module_name}.{name}'
+
+            if filters and not any(f in effect for f in filters):
+                continue
+
+            if name in SKIP:
+                skipped.append({'effect': effect, 'reason': SKIP[name]})
+            elif get_job(key) is None:
+                skipped.append({'effect': effect, 'reason': 'not an imaging job'})
+            else:
+                jobs.append((module_name, name, key))
+    return jobs, skipped
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    jobs, skipped = collect_jobs(args.filter, args.assets)
+    corpus = build_corpus()
+    context = multiprocessing.get_context('spawn')
+
+    results = []
+    pool = context.Pool(1, maxtasksperchild=1)
+    try:
+        for module_name, name, key in jobs:
+            for input_name, data in corpus.items():
+                task = pool.apply_async(_run_case, (key, name, data, args.repeat, args.assets))
+                try:
+                    result = task.get(args.timeout)
+                except multiprocessing.TimeoutError:
+                    pool.terminate()
+                    pool = context.Pool(1, maxtasksperchild=1)
+                    result = {'error': f'timed out after {args.timeout}s'}
+
+                results.append({'effect': f'{module_name}.{name}', 'input': input_name, **result})
+                print(f'{module_name}.{name} [{input_name}]: {result.get("p50_ms", result.get("error"))}', file=sys.stderr)
+    finally:
+        pool.terminate()
+
+    return {
+        'meta': {
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pillow': Image.__version__,
+            'repeat': args.repeat,
+            'corpus': {name: len(data) for name, data in corpus.items()},
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filter', nargs='*', default=[], help='only run effects whose `module.name` contains one of these')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case, after one warmup run')
+    parser.add_argument('--timeout', type=int, default=300, help='seconds a case may take before it is abandoned')
+    parser.add_argument('--assets', default=None, help='path of the assets directory, overriding `get_asset`')
+    parser.add_argument('--output', default=None, help='file to write the JSON report to, instead of stdout')
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
@@ -20,16 +20,63 @@ from urllib.parse import quote
 import jishaku
 import discord
 from discord.ext import commands
-from aiohttp import ClientSession
+from aiohttp import ClientSession, web
 
 from .utils.context import BombContext
 from .utils.imaging import BaseImageException, svg_to_png
+from .utils.imaging.workers import start_process_pool, shutdown_process_pool
+from .utils.imaging.cache import configure_result_cache, configure_fetch_cache
+from .utils.imaging.output import configure_output
+from .utils.imaging.converter import fetch_url
+from .utils.imaging.metrics import start_metrics_server
+from .utils.imaging.scheduler import configure_scheduler
+from .utils.imaging.costs import configure_cost_model, get_cost_model
 
 if TYPE_CHECKING:
+    from typing_extensions import NotRequired
+
+    class CacheConfig(TypedDict, total=False):
+        ENABLED: bool
+        MAX_BYTES: int
+        TTL: Optional[float]
+        DIRECTORY: Optional[str]
+        MAX_DISK_BYTES: Optional[int]
+
+    class OutputConfig(TypedDict, total=False):
+        FORMAT: str
+        GUILDS: dict[str, str]
+        FALLBACK: list[str]
+        PATH: Optional[str]
+
+    class SchedulerConfig(TypedDict, total=False):
+        MAX_JOBS: int
+        MAX_COST: int
+        MAX_QUEUED: int
+        FAST_JOBS: int
+
+    class CostModelConfig(TypedDict, total=False):
+        FAST_SECONDS: float
+        ALPHA: float
+        PATH: Optional[str]
+
+    class MetricsConfig(TypedDict, total=False):
+        ENABLED: bool
+        HOST: str
+        PORT: int
+
+    class ImagingConfig(TypedDict, total=False):
+        PROCESS_WORKERS: int
+        RESULT_CACHE: CacheConfig
+        FETCH_CACHE: CacheConfig
+        OUTPUT: OutputConfig
+        SCHEDULER: SchedulerConfig
+        COST_MODEL: CostModelConfig
+        METRICS: MetricsConfig
 
     class Config(TypedDict):
         TOKEN: str
         PREFIXES: list[str]
+        IMAGING: NotRequired[ImagingConfig]
 
     class CodeData(TypedDict):
         classes: int
@@ -46,6 +93,7 @@ class BombBot(commands.Bot):
     def __init__(self, **options: Any) -> None:
 
         self.session: Optional[ClientSession] = None
+        self.metrics_runner: Optional[web.AppRunner] = None
         self.code_stats: CodeData = {
             'classes': 0,
             'funcs': 0,
@@ -142,9 +190,42 @@ class BombBot(commands.Bot):
             **kwargs,
         )
 
+    def setup_imaging(self) -> None:
+        config = self.config.get('IMAGING', {})
+
+        if workers := config.get('PROCESS_WORKERS'):
+            start_process_pool(workers)
+            self.logger.info(f'started imaging process pool with {workers} workers')
+
+        if (cache := config.get('RESULT_CACHE')) is not None:
+            configure_result_cache(**{key.lower(): value for key, value in cache.items()})
+
+        if (cache := config.get('FETCH_CACHE')) is not None:
+            configure_fetch_cache(**{key.lower(): value for key, value in cache.items()})
+
+        if (output := config.get('OUTPUT')) is not None:
+            configure_output(**{key.lower(): value for key, value in output.items()})
+
+        scheduler = {key.lower(): value for key, value in config.get('SCHEDULER', {}).items()}
+        scheduler.setdefault('max_jobs', workers)
+        configure_scheduler(**scheduler)
+
+        if (cost_model := config.get('COST_MODEL')) is not None:
+            configure_cost_model(**{key.lower(): value for key, value in cost_model.items()})
+
+    async def setup_metrics(self) -> None:
+        config = self.config.get('IMAGING', {}).get('METRICS')
+
+        if config is not None and config.get('ENABLED', True):
+            host, port = config.get('HOST', '127.0.0.1'), config.get('PORT', 9108)
+            self.metrics_runner = await start_metrics_server(host, port)
+            self.logger.info(f'serving imaging metrics at http://{host}:{port}/metrics')
+
     async def setup_hook(self) -> None:
         self.session = ClientSession()
-        return await self.load_all_cogs()
+        await self.load_all_cogs()
+        self.setup_imaging()
+        return await self.setup_metrics()
 
     async def load_all_cogs(self, *, load_jishaku: bool = True) -> None:
 
@@ -193,6 +274,10 @@ class BombBot(commands.Bot):
     async def close(self) -> None:
         if session := self.session:
             await session.close()
+        if runner := self.metrics_runner:
+            await runner.cleanup()
+        shutdown_process_pool()
+        get_cost_model().save()
         return await super().close()
 
     async def get_context(self, message: discord.Message | discord.Interaction, *, cls: type[commands.Context] = BombContext) -> commands.Context | BombContext:
@@ -228,13 +313,11 @@ class BombBot(commands.Bot):
                 ext = ('png', 'svg')[svg]
                 url = f'https://raw.githubusercontent.com/twitter/twemoji/master/assets/{folder}/{ord(emoji):x}.{ext}'
 
-            async with self.session.get(url) as r:
-                if r.ok:
-                    byt = await r.read()
-                    if svg:
-                        return await svg_to_png(byt)
-                    else:
-                        return byt
+            if r := await fetch_url(self.session, url, immutable=True):
+                if svg:
+                    return await svg_to_png(r.data)
+                else:
+                    return r.data
         except Exception:
             return None
 
@@ -11,6 +11,7 @@ from bot.utils.imaging import do_command, ImageConverter
 
 from bot.utils.imaging.flags import *
 from bot.utils.imaging.colormap_filters import ColorMapView
+from bot.utils.imaging.output import set_guild_format
 from bot.utils.imaging.pil_functions import *
 from bot.utils.imaging.wand_functions import *
 from bot.utils.imaging.cv_functions import *
@@ -35,17 +36,21 @@ class Imaging(commands.Cog):
             commands.max_concurrency(2, commands.BucketType.user)(command)
 
     async def cog_unload(self) -> None:
-        """Reloads the respective imaging modules on extension reload"""
+        """Reloads the respective imaging modules on extension reload
+        and restarts the process pool so its workers pick up the reloaded code
+        """
         from importlib import reload
         from bot.utils.imaging import colormap_filters
         from bot.utils.imaging import pil_functions
         from bot.utils.imaging import wand_functions
         from bot.utils.imaging import cv_functions
+        from bot.utils.imaging.workers import restart_process_pool
 
         reload(colormap_filters)
         reload(pil_functions)
         reload(wand_functions)
         reload(cv_functions)
+        restart_process_pool()
 
     # wand functions
     @commands.command(name='blur')
@@ -388,5 +393,22 @@ class Imaging(commands.Cog):
                 )
             )
 
+    @commands.command(name='outputformat', aliases=('output-format', 'animformat'))
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def _outputformat(self, ctx: BombContext, format: Optional[Literal['gif', 'webp', 'apng']] = None) -> None:
+        """Sets the format animated outputs are sent as in this server (`gif`, `webp` or `apng`)
+        resets it to the default if no format is provided
+        """
+        saved = set_guild_format(ctx.guild.id, format)
+        if format is None:
+            message = 'Animated outputs in this server are now sent in the default format'
+        else:
+            message = f'Animated outputs in this server are now sent as `{format}`'
+
+        if not saved:
+            message += ' until the bot restarts'
+        await ctx.send(message)
+
 async def setup(bot: BombBot) -> None:
     await bot.add_cog(Imaging(bot))
\ No newline at end of file
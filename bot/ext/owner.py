@@ -12,6 +12,9 @@ from PIL import Image
 from jishaku.codeblocks import codeblock_converter
 from fstop import Runner
 
+from ..utils.imaging.metrics import REGISTRY
+from ..utils.imaging.scheduler import get_scheduler
+
 if TYPE_CHECKING:
     from ..utils.context import BombContext
     from ..bot import BombBot
@@ -102,5 +105,32 @@ class Owner(commands.Cog):
             await ctx.bot.reload_extension(abs_extension)
             await ctx.send(f'`🔁 {abs_extension}` reloaded successfully')
 
+    @commands.command(name='imagingstats', aliases=('istats',))
+    async def imaging_stats(self, ctx: BombContext, reset: bool = False) -> None:
+        """Per-stage timings of the imaging jobs run since startup (or the last reset)"""
+        snapshot = REGISTRY.snapshot()
+        scheduler = get_scheduler()
+        load = (
+            f'running: {scheduler.fast.running} fast + {scheduler.slow.running} slow / {scheduler.max_jobs} workers, '
+            f'{scheduler.running_cost}/{scheduler.max_cost} cost, '
+            f'queued: {len(scheduler.fast.queue)} fast + {len(scheduler.slow.queue)} slow'
+        )
+
+        if not snapshot:
+            await ctx.send(f'No imaging jobs have been recorded yet\n`{load}`')
+            return
+
+        rows = [f'{"stage":<8}{"count":>8}{"avg ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"bytes":>14}']
+        for stage, stats in snapshot.items():
+            rows.append(
+                f'{stage:<8}{stats.count:>8}{stats.sum / stats.count * 1000:>10.1f}'
+                f'{stats.quantile(0.5) * 1000:>10.1f}{stats.quantile(0.95) * 1000:>10.1f}{stats.bytes:>14,}'
+            )
+
+        if reset:
+            REGISTRY.reset()
+        table = '\n'.join(rows)
+        await ctx.send(f'```\n{table}\n\n{load}\n```')
+
 async def setup(bot: BombBot) -> None:
     await bot.add_cog(Owner(bot))
\ No newline at end of file
@@ -16,6 +16,8 @@ class BombContext(commands.Context['BombBot']):
     Overrides: send, reply
     New methods: confirm, loading
     """
+    # the error of a converter that failed on an `Optional` parameter, which discord.py does not propagate
+    image_error: Optional[commands.BadArgument] = None
 
     async def reply(self, content: Any = None, **kwargs: Any) -> discord.Message:
         """Overrides default reply method to set mention_author to False by default."""
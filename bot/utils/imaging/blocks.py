@@ -0,0 +1,218 @@
+"""
+Vectorized block mosaic engine, used by the minecraft command
+
+The tile atlas, mean colors and color lookup table are built once into a single binary file,
+which is memory-mapped on import (and shared between worker processes through the page cache)
+
+Build it ahead of time with `python -m bot.utils.imaging.blocks`,
+otherwise it is built on first import
+"""
+from __future__ import annotations
+
+from typing import Any, Final, Optional
+import contextlib
+import tempfile
+import hashlib
+import pathlib
+import struct
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from ..helpers import get_asset
+
+__all__: tuple[str, ...] = (
+    'BLOCK_SIZE',
+    'LUT_BITS',
+    'load_block_palette',
+    'build_color_lut',
+    'build_block_data',
+    'save_block_data',
+    'load_block_data',
+    'render_blocks',
+)
+
+BLOCK_SIZE: Final[int] = 16
+LUT_BITS: Final[int] = 5
+LUT_CHUNK: Final[int] = 4096
+
+BLOCK_FOLDER: Final[str] = 'minecraft/'
+BLOCK_DATA_FILE: Final[str] = 'minecraft.blocks'
+MAGIC: Final[bytes] = b'BOMBBLK1'
+ALIGNMENT: Final[int] = 64
+
+
+def load_block_palette(folder: str = BLOCK_FOLDER) -> tuple[np.ndarray, np.ndarray]:
+    """Loads every block texture in `folder`
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        the `(n, BLOCK_SIZE, BLOCK_SIZE, 4)` RGBA tile atlas and the `(n, 3)` mean color of each tile,
+        blocks sharing a mean color are deduplicated (the last one wins)
+    """
+    blocks: dict[tuple[int, int, int], np.ndarray] = {}
+
+    for file in sorted(pathlib.Path(get_asset(folder)).glob('*.png')):
+        with Image.open(file) as block:
+            block = block.convert('RGB')
+            color = block.resize((1, 1)).getpixel((0, 0))
+            blocks[color] = np.asarray(
+                block.resize((BLOCK_SIZE, BLOCK_SIZE)).convert('RGBA')
+            )
+
+    atlas = np.stack(list(blocks.values()))
+    colors = np.array(list(blocks.keys()), dtype=np.uint8)
+    return atlas, colors
+
+def build_color_lut(colors: np.ndarray, *, bits: int = LUT_BITS) -> np.ndarray:
+    """Precomputes the index of the nearest (euclidean) color in `colors`
+    for the center of every cell of an RGB cube quantized to `bits` per channel
+    """
+    levels = 1 << bits
+    step = 256 // levels
+
+    axis = np.arange(levels, dtype=np.float32) * step + step / 2
+    cube = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    sample = colors.astype(np.float32)
+    sample_sq = (sample ** 2).sum(axis=1)
+
+    lut = np.empty(len(cube), dtype=np.uint16)
+    for start in range(0, len(cube), LUT_CHUNK):
+        chunk = cube[start:start + LUT_CHUNK]
+        # |a - b|^2 without the |a|^2 term, which does not change the argmin
+        distances = sample_sq - 2 * chunk @ sample.T
+        lut[start:start + LUT_CHUNK] = distances.argmin(axis=1)
+
+    return lut.reshape(levels, levels, levels)
+
+def _fingerprint(folder: str = BLOCK_FOLDER) -> str:
+    """Identifies the set of textures (by name and size) and the build parameters"""
+    digest = hashlib.blake2b(f'{BLOCK_SIZE}:{LUT_BITS}'.encode(), digest_size=16)
+
+    for entry in sorted(os.scandir(get_asset(folder)), key=lambda entry: entry.name):
+        if entry.name.endswith('.png'):
+            digest.update(f'{entry.name}:{entry.stat().st_size};'.encode())
+    return digest.hexdigest()
+
+def build_block_data(folder: str = BLOCK_FOLDER) -> dict[str, np.ndarray]:
+    atlas, colors = load_block_palette(folder)
+    return {
+        'atlas': atlas,
+        'colors': colors,
+        'lut': build_color_lut(colors),
+    }
+
+def save_block_data(path: str | os.PathLike, arrays: dict[str, np.ndarray], *, fingerprint: str) -> None:
+    """Writes `arrays` as `MAGIC`, a little-endian u32 header length, a JSON header
+    and then every array's raw bytes, each aligned to `ALIGNMENT`
+    """
+    layout: dict[str, Any] = {}
+    offset = 0
+
+    for name, arr in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {'dtype': arr.dtype.str, 'shape': arr.shape, 'offset': offset}
+        offset += arr.nbytes
+
+    header = json.dumps({'fingerprint': fingerprint, 'arrays': layout}).encode()
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+    data_start = len(MAGIC) + 4 + len(header)
+
+    path = pathlib.Path(path)
+    # a temporary file of its own, as other processes (e.g. spawned workers) may be building it at the same time
+    fp = tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix='.tmp', delete=False)
+    try:
+        with fp:
+            fp.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+            for name, arr in arrays.items():
+                fp.seek(data_start + layout[name]['offset'])
+                fp.write(np.ascontiguousarray(arr).tobytes())
+        os.replace(fp.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(fp.name)
+        raise
+
+def _map_block_data(path: str | os.PathLike, *, fingerprint: str) -> Optional[dict[str, np.ndarray]]:
+    try:
+        with open(path, 'rb') as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                return None
+
+            (length,) = struct.unpack('<I', fp.read(4))
+            header = json.loads(fp.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if not isinstance(header, dict) or header.get('fingerprint') != fingerprint:
+        return None
+
+    data_start = len(MAGIC) + 4 + length
+    try:
+        return {
+            name: np.memmap(
+                path,
+                dtype=np.dtype(spec['dtype']),
+                mode='r',
+                offset=data_start + spec['offset'],
+                shape=tuple(spec['shape']),
+            )
+            for name, spec in header['arrays'].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        # truncated, or replaced by another process while being read, it is rebuilt
+        return None
+
+def load_block_data(*, rebuild: bool = False) -> dict[str, np.ndarray]:
+    """Memory-maps the prebuilt block data, (re)building it first if it is missing or
+    the textures changed since it was built
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        `atlas`, `colors` and `lut`, see `load_block_palette` and `build_color_lut`
+    """
+    path = get_asset(BLOCK_DATA_FILE)
+    fingerprint = _fingerprint()
+
+    if not rebuild and (arrays := _map_block_data(path, fingerprint=fingerprint)) is not None:
+        return arrays
+
+    arrays = build_block_data()
+    try:
+        save_block_data(path, arrays, fingerprint=fingerprint)
+    except OSError:
+        return arrays
+    return _map_block_data(path, fingerprint=fingerprint) or arrays
+
+def render_blocks(pixels: np.ndarray, atlas: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Renders an `(h, w, 4)` RGBA array as a mosaic of `atlas` tiles in one gather,
+    fully transparent pixels are left empty
+
+    Returns
+    -------
+    np.ndarray
+        an `(h * tile, w * tile, 4)` RGBA array
+    """
+    h, w, _ = pixels.shape
+    tile = atlas.shape[1]
+    shift = 8 - (len(lut) - 1).bit_length()
+
+    rgb = pixels[..., :3] >> shift
+    tiles = atlas[lut[rgb[..., 0], rgb[..., 1], rgb[..., 2]]]
+    tiles[pixels[..., 3] == 0] = 0
+
+    return tiles.transpose(0, 2, 1, 3, 4).reshape(h * tile, w * tile, 4)
+
+
+if __name__ == '__main__':
+    data = load_block_data(rebuild=True)
+    print(
+        f'built {get_asset(BLOCK_DATA_FILE)}: '
+        f'{len(data["colors"])} blocks, {sum(arr.nbytes for arr in data.values()) / 1024:.0f} KiB'
+    )
@@ -1,258 +0,0 @@
-BRAILLE_DATA: dict[str, str] = {
-    "00 00 00 00": ".",
-    "00 00 00 01": "⢀",
-    "00 00 00 10": "⡀",
-    "00 00 00 11": "⣀",
-    "00 00 01 00": "⠠",
-    "00 00 01 01": "⢠",
-    "00 00 01 10": "⡠",
-    "00 00 01 11": "⣠",
-    "00 00 10 00": "⠄",
-    "00 00 10 01": "⢄",
-    "00 00 10 10": "⡄",
-    "00 00 10 11": "⣄",
-    "00 00 11 00": "⠤",
-    "00 00 11 01": "⢤",
-    "00 00 11 10": "⡤",
-    "00 00 11 11": "⣤",
-    "00 01 00 00": "⠐",
-    "00 01 00 01": "⢐",
-    "00 01 00 10": "⡐",
-    "00 01 00 11": "⣐",
-    "00 01 01 00": "⠰",
-    "00 01 01 01": "⢰",
-    "00 01 01 10": "⡰",
-    "00 01 01 11": "⣰",
-    "00 01 10 00": "⠔",
-    "00 01 10 01": "⢔",
-    "00 01 10 10": "⡔",
-    "00 01 10 11": "⣔",
-    "00 01 11 00": "⠴",
-    "00 01 11 01": "⢴",
-    "00 01 11 10": "⡴",
-    "00 01 11 11": "⣴",
-    "00 10 00 00": "⠂",
-    "00 10 00 01": "⢂",
-    "00 10 00 10": "⡂",
-    "00 10 00 11": "⣂",
-    "00 10 01 00": "⠢",
-    "00 10 01 01": "⢢",
-    "00 10 01 10": "⡢",
-    "00 10 01 11": "⣢",
-    "00 10 10 00": "⠆",
-    "00 10 10 01": "⢆",
-    "00 10 10 10": "⡆",
-    "00 10 10 11": "⣆",
-    "00 10 11 00": "⠦",
-    "00 10 11 01": "⢦",
-    "00 10 11 10": "⡦",
-    "00 10 11 11": "⣦",
-    "00 11 00 00": "⠒",
-    "00 11 00 01": "⢒",
-    "00 11 00 10": "⡒",
-    "00 11 00 11": "⣒",
-    "00 11 01 00": "⠲",
-    "00 11 01 01": "⢲",
-    "00 11 01 10": "⡲",
-    "00 11 01 11": "⣲",
-    "00 11 10 00": "⠖",
-    "00 11 10 01": "⢖",
-    "00 11 10 10": "⡖",
-    "00 11 10 11": "⣖",
-    "00 11 11 00": "⠶",
-    "00 11 11 01": "⢶",
-    "00 11 11 10": "⡶",
-    "00 11 11 11": "⣶",
-    "01 00 00 00": "⠈",
-    "01 00 00 01": "⢈",
-    "01 00 00 10": "⡈",
-    "01 00 00 11": "⣈",
-    "01 00 01 00": "⠨",
-    "01 00 01 01": "⢨",
-    "01 00 01 10": "⡨",
-    "01 00 01 11": "⣨",
-    "01 00 10 00": "⠌",
-    "01 00 10 01": "⢌",
-    "01 00 10 10": "⡌",
-    "01 00 10 11": "⣌",
-    "01 00 11 00": "⠬",
-    "01 00 11 01": "⢬",
-    "01 00 11 10": "⡬",
-    "01 00 11 11": "⣬",
-    "01 01 00 00": "⠘",
-    "01 01 00 01": "⢘",
-    "01 01 00 10": "⡘",
-    "01 01 00 11": "⣘",
-    "01 01 01 00": "⠸",
-    "01 01 01 01": "⢸",
-    "01 01 01 10": "⡸",
-    "01 01 01 11": "⣸",
-    "01 01 10 00": "⠜",
-    "01 01 10 01": "⢜",
-    "01 01 10 10": "⡜",
-    "01 01 10 11": "⣜",
-    "01 01 11 00": "⠼",
-    "01 01 11 01": "⢼",
-    "01 01 11 10": "⡼",
-    "01 01 11 11": "⣼",
-    "01 10 00 00": "⠊",
-    "01 10 00 01": "⢊",
-    "01 10 00 10": "⡊",
-    "01 10 00 11": "⣊",
-    "01 10 01 00": "⠪",
-    "01 10 01 01": "⢪",
-    "01 10 01 10": "⡪",
-    "01 10 01 11": "⣪",
-    "01 10 10 00": "⠎",
-    "01 10 10 01": "⢎",
-    "01 10 10 10": "⡎",
-    "01 10 10 11": "⣎",
-    "01 10 11 00": "⠮",
-    "01 10 11 01": "⢮",
-    "01 10 11 10": "⡮",
-    "01 10 11 11": "⣮",
-    "01 11 00 00": "⠚",
-    "01 11 00 01": "⢚",
-    "01 11 00 10": "⡚",
-    "01 11 00 11": "⣚",
-    "01 11 01 00": "⠺",
-    "01 11 01 01": "⢺",
-    "01 11 01 10": "⡺",
-    "01 11 01 11": "⣺",
-    "01 11 10 00": "⠞",
-    "01 11 10 01": "⢞",
-    "01 11 10 10": "⡞",
-    "01 11 10 11": "⣞",
-    "01 11 11 00": "⠾",
-    "01 11 11 01": "⢾",
-    "01 11 11 10": "⡾",
-    "01 11 11 11": "⣾",
-    "10 00 00 00": "⠁",
-    "10 00 00 01": "⢁",
-    "10 00 00 10": "⡁",
-    "10 00 00 11": "⣁",
-    "10 00 01 00": "⠡",
-    "10 00 01 01": "⢡",
-    "10 00 01 10": "⡡",
-    "10 00 01 11": "⣡",
-    "10 00 10 00": "⠅",
-    "10 00 10 01": "⢅",
-    "10 00 10 10": "⡅",
-    "10 00 10 11": "⣅",
-    "10 00 11 00": "⠥",
-    "10 00 11 01": "⢥",
-    "10 00 11 10": "⡥",
-    "10 00 11 11": "⣥",
-    "10 01 00 00": "⠑",
-    "10 01 00 01": "⢑",
-    "10 01 00 10": "⡑",
-    "10 01 00 11": "⣑",
-    "10 01 01 00": "⠱",
-    "10 01 01 01": "⢱",
-    "10 01 01 10": "⡱",
-    "10 01 01 11": "⣱",
-    "10 01 10 00": "⠕",
-    "10 01 10 01": "⢕",
-    "10 01 10 10": "⡕",
-    "10 01 10 11": "⣕",
-    "10 01 11 00": "⠵",
-    "10 01 11 01": "⢵",
-    "10 01 11 10": "⡵",
-    "10 01 11 11": "⣵",
-    "10 10 00 00": "⠃",
-    "10 10 00 01": "⢃",
-    "10 10 00 10": "⡃",
-    "10 10 00 11": "⣃",
-    "10 10 01 00": "⠣",
-    "10 10 01 01": "⢣",
-    "10 10 01 10": "⡣",
-    "10 10 01 11": "⣣",
-    "10 10 10 00": "⠇",
-    "10 10 10 01": "⢇",
-    "10 10 10 10": "⡇",
-    "10 10 10 11": "⣇",
-    "10 10 11 00": "⠧",
-    "10 10 11 01": "⢧",
-    "10 10 11 10": "⡧",
-    "10 10 11 11": "⣧",
-    "10 11 00 00": "⠓",
-    "10 11 00 01": "⢓",
-    "10 11 00 10": "⡓",
-    "10 11 00 11": "⣓",
-    "10 11 01 00": "⠳",
-    "10 11 01 01": "⢳",
-    "10 11 01 10": "⡳",
-    "10 11 01 11": "⣳",
-    "10 11 10 00": "⠗",
-    "10 11 10 01": "⢗",
-    "10 11 10 10": "⡗",
-    "10 11 10 11": "⣗",
-    "10 11 11 00": "⠷",
-    "10 11 11 01": "⢷",
-    "10 11 11 10": "⡷",
-    "10 11 11 11": "⣷",
-    "11 00 00 00": "⠉",
-    "11 00 00 01": "⢉",
-    "11 00 00 10": "⡉",
-    "11 00 00 11": "⣉",
-    "11 00 01 00": "⠩",
-    "11 00 01 01": "⢩",
-    "11 00 01 10": "⡩",
-    "11 00 01 11": "⣩",
-    "11 00 10 00": "⠍",
-    "11 00 10 01": "⢍",
-    "11 00 10 10": "⡍",
-    "11 00 10 11": "⣍",
-    "11 00 11 00": "⠭",
-    "11 00 11 01": "⢭",
-    "11 00 11 10": "⡭",
-    "11 00 11 11": "⣭",
-    "11 01 00 00": "⠙",
-    "11 01 00 01": "⢙",
-    "11 01 00 10": "⡙",
-    "11 01 00 11": "⣙",
-    "11 01 01 00": "⠹",
-    "11 01 01 01": "⢹",
-    "11 01 01 10": "⡹",
-    "11 01 01 11": "⣹",
-    "11 01 10 00": "⠝",
-    "11 01 10 01": "⢝",
-    "11 01 10 10": "⡝",
-    "11 01 10 11": "⣝",
-    "11 01 11 00": "⠽",
-    "11 01 11 01": "⢽",
-    "11 01 11 10": "⡽",
-    "11 01 11 11": "⣽",
-    "11 10 00 00": "⠋",
-    "11 10 00 01": "⢋",
-    "11 10 00 10": "⡋",
-    "11 10 00 11": "⣋",
-    "11 10 01 00": "⠫",
-    "11 10 01 01": "⢫",
-    "11 10 01 10": "⡫",
-    "11 10 01 11": "⣫",
-    "11 10 10 00": "⠏",
-    "11 10 10 01": "⢏",
-    "11 10 10 10": "⡏",
-    "11 10 10 11": "⣏",
-    "11 10 11 00": "⠯",
-    "11 10 11 01": "⢯",
-    "11 10 11 10": "⡯",
-    "11 10 11 11": "⣯",
-    "11 11 00 00": "⠛",
-    "11 11 00 01": "⢛",
-    "11 11 00 10": "⡛",
-    "11 11 00 11": "⣛",
-    "11 11 01 00": "⠻",
-    "11 11 01 01": "⢻",
-    "11 11 01 10": "⡻",
-    "11 11 01 11": "⣻",
-    "11 11 10 00": "⠟",
-    "11 11 10 01": "⢟",
-    "11 11 10 10": "⡟",
-    "11 11 10 11": "⣟",
-    "11 11 11 00": "⠿",
-    "11 11 11 01": "⢿",
-    "11 11 11 10": "⡿",
-    "11 11 11 11": "⣿"
-}
\ No newline at end of file
@@ -0,0 +1,343 @@
+"""
+Byte caches for the imaging pipeline
+"""
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Final,
+    TypeVar,
+    Optional,
+    Callable,
+    Awaitable,
+    NamedTuple,
+)
+from collections import OrderedDict
+import threading
+import hashlib
+import asyncio
+import pathlib
+import json
+import time
+import os
+
+__all__: tuple[str, ...] = (
+    'CacheEntry',
+    'ByteCache',
+    'SingleFlight',
+    'hash_bytes',
+    'result_key',
+    'configure_result_cache',
+    'get_result_cache',
+    'configure_fetch_cache',
+    'get_fetch_cache',
+)
+
+MIB: Final[int] = 1024 * 1024
+
+T = TypeVar('T')
+
+
+class CacheEntry(NamedTuple):
+    data: bytes
+    meta: dict[str, Any]
+    created: float
+
+
+class ByteCache:
+    """An LRU cache of `bytes` values
+
+    Parameters
+    ----------
+    max_bytes : int
+        the in-memory byte budget, least recently used entries are evicted past it
+    ttl : Optional[float]
+        seconds after which an entry is considered stale and dropped
+    directory : Optional[str | os.PathLike]
+        enables an on-disk tier, entries evicted from memory remain there
+        and are promoted back into memory when requested again
+    max_disk_bytes : Optional[int]
+        the byte budget of the on-disk tier, defaults to 4x `max_bytes`
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 64 * MIB,
+        ttl: Optional[float] = None,
+        directory: Optional[str | os.PathLike] = None,
+        max_disk_bytes: Optional[int] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = pathlib.Path(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes or max_bytes * 4
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._size: int = 0
+        self._disk_size: Optional[int] = None
+        self._lock = threading.Lock()
+
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _pop(self, key: str) -> Optional[CacheEntry]:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self._size -= len(entry.data)
+        return entry
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= len(entry.data)
+
+    def get_memory(self, key: str) -> Optional[CacheEntry]:
+        """Looks up `key` in memory only, safe to call from within the event loop"""
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+
+            if self._expired(entry.created):
+                self._pop(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        if (entry := self.get_memory(key)) is not None or not self.directory:
+            return entry
+
+        if (entry := self._read_disk(key)) is not None:
+            self._put_memory(key, entry)
+        return entry
+
+    def put(self, key: str, data: bytes, **meta: Any) -> CacheEntry:
+        entry = CacheEntry(data, meta, time.time())
+        self._put_memory(key, entry)
+
+        if self.directory:
+            self._write_disk(key, entry)
+        return entry
+
+    def _put_memory(self, key: str, entry: CacheEntry) -> None:
+        if len(entry.data) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._size += len(entry.data)
+            self._evict()
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+        if self.directory:
+            for path in self._disk_paths(key):
+                path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    async def aget(self, key: str) -> Optional[CacheEntry]:
+        """`get`, with disk reads done in a thread"""
+        if (entry := self.get_memory(key)) is not None or not self.directory:
+            return entry
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, data: bytes, **meta: Any) -> CacheEntry:
+        """`put`, with disk writes done in a thread"""
+        if not self.directory:
+            return self.put(key, data, **meta)
+        return await asyncio.to_thread(self.put, key, data, **meta)
+
+    # disk tier
+
+    def _disk_paths(self, key: str) -> tuple[pathlib.Path, pathlib.Path]:
+        folder = self.directory / key[:2]
+        return folder / f'{key}.bin', folder / f'{key}.json'
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        data_path, meta_path = self._disk_paths(key)
+        try:
+            header = json.loads(meta_path.read_text())
+            if self._expired(header['created']):
+                self.discard(key)
+                return None
+
+            data = data_path.read_bytes()
+        except (OSError, ValueError, KeyError):
+            return None
+        else:
+            # the mtime doubles as the last access time for `_trim_disk`
+            os.utime(data_path)
+            return CacheEntry(data, header['meta'], header['created'])
+
+    def _write_disk(self, key: str, entry: CacheEntry) -> None:
+        data_path, meta_path = self._disk_paths(key)
+        try:
+            data_path.parent.mkdir(exist_ok=True)
+            meta_path.write_text(json.dumps({'created': entry.created, 'meta': entry.meta}))
+
+            # write then rename so that readers never see a partial file
+            temp = data_path.with_suffix('.tmp')
+            temp.write_bytes(entry.data)
+            temp.replace(data_path)
+        except OSError:
+            return
+
+        if self._disk_size is not None:
+            self._disk_size += len(entry.data)
+
+        if self._disk_size is None or self._disk_size > self.max_disk_bytes:
+            self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        files: list[tuple[float, int, pathlib.Path]] = []
+        for path in self.directory.glob('*/*.bin'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        # least recently used (written or read) first
+        files.sort()
+        total = sum(size for _, size, _ in files)
+
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix('.json').unlink(missing_ok=True)
+            total -= size
+
+        self._disk_size = total
+
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Future[Any]) -> None:
+        self.task = task
+        self.waiters: int = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key: callers of a key that is already in flight await that call
+    instead of starting their own, it is cancelled only once every one of its callers has been
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Awaits the call in flight for `key`, starting `factory()` as one if there is none"""
+        if (call := self._calls.get(key)) is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(factory()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            # shielded so that one caller being cancelled does not cancel the call for the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                call.task.cancel()
+                # callers arriving before the cancellation completes start a new call
+                self._forget(key, call)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def result_key(
+    job: str,
+    data: bytes,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    options: Any = None,
+) -> str:
+    """The content address of an imaging job: its input bytes, the function, its arguments and output options"""
+    params = repr((args, sorted(kwargs.items()), options))
+    return hash_bytes(
+        b'\0'.join((hash_bytes(data).encode(), job.encode(), params.encode()))
+    )
+
+
+_RESULT_CACHE: Optional[ByteCache] = ByteCache(max_bytes=64 * MIB, ttl=60 * 60)
+
+def configure_result_cache(
+    *,
+    enabled: bool = True,
+    max_bytes: int = 64 * MIB,
+    ttl: Optional[float] = 60 * 60,
+    directory: Optional[str | os.PathLike] = None,
+    max_disk_bytes: Optional[int] = None,
+) -> Optional[ByteCache]:
+    """Replaces the cache of encoded imaging results, `enabled=False` turns it off"""
+    global _RESULT_CACHE
+
+    _RESULT_CACHE = ByteCache(
+        max_bytes=max_bytes,
+        ttl=ttl,
+        directory=directory,
+        max_disk_bytes=max_disk_bytes,
+    ) if enabled else None
+    return _RESULT_CACHE
+
+def get_result_cache() -> Optional[ByteCache]:
+    return _RESULT_CACHE
+
+
+_FETCH_CACHE: Optional[ByteCache] = ByteCache(max_bytes=32 * MIB, ttl=24 * 60 * 60)
+
+def configure_fetch_cache(
+    *,
+    enabled: bool = True,
+    max_bytes: int = 32 * MIB,
+    ttl: Optional[float] = 24 * 60 * 60,
+    directory: Optional[str | os.PathLike] = None,
+    max_disk_bytes: Optional[int] = None,
+) -> Optional[ByteCache]:
+    """Replaces the cache of downloaded image sources, `enabled=False` turns it off"""
+    global _FETCH_CACHE
+
+    _FETCH_CACHE = ByteCache(
+        max_bytes=max_bytes,
+        ttl=ttl,
+        directory=directory,
+        max_disk_bytes=max_disk_bytes,
+    ) if enabled else None
+    return _FETCH_CACHE
+
+def get_fetch_cache() -> Optional[ByteCache]:
+    return _FETCH_CACHE
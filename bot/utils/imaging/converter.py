@@ -1,31 +1,117 @@
 from __future__ import annotations
 
-from typing import ClassVar, Optional, TypeAlias, TYPE_CHECKING
+from typing import ClassVar, Final, Optional, NamedTuple, TypeAlias, TYPE_CHECKING
 from io import BytesIO
+import time
 
 import discord
 from discord.ext import commands
 from wand.color import Color
 
 from . import image as image_mod
+from .cache import get_fetch_cache, hash_bytes
 from .exceptions import InvalidColor, ImageTooLarge
 from ..helpers import Regexes
 
 if TYPE_CHECKING:
     from re import Match
-    from aiohttp import ClientResponse
+    from aiohttp import ClientSession, ClientResponse
     from ..context import BombContext
 
     Argument: TypeAlias = discord.Member | discord.User | discord.PartialEmoji | bytes
 
 
 __all__: tuple[str, ...] = (
+    'FetchResult',
+    'read_limited',
+    'fetch_url',
     'ColorConverter',
     'DefaultEmojiConverter',
     'UrlConverter',
     'ImageConverter',
 )
 
+REVALIDATE_AFTER: Final[int] = 5 * 60
+MAX_IMAGE_SIZE: Final[int] = 15_000_000
+CHUNK_SIZE: Final[int] = 64 * 1024
+
+
+class FetchResult(NamedTuple):
+    data: bytes
+    content_type: str
+
+async def read_limited(response: ClientResponse, max_size: Optional[int] = MAX_IMAGE_SIZE) -> bytes:
+    """Reads the body of `response` in chunks,
+    raising `ImageTooLarge` as soon as the `Content-Length` or the bytes read so far exceed `max_size`
+    """
+    if max_size is None:
+        return await response.read()
+
+    if (length := response.content_length) is not None and length > max_size:
+        response.close()
+        raise ImageTooLarge(length, max_size)
+
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            response.close()
+            raise ImageTooLarge(size, max_size)
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+async def fetch_url(
+    session: ClientSession,
+    url: str,
+    *,
+    immutable: bool = False,
+    max_size: Optional[int] = MAX_IMAGE_SIZE,
+) -> Optional[FetchResult]:
+    """GETs `url` through the fetch cache, returns `None` on an unsuccessful response
+
+    Entries older than `REVALIDATE_AFTER` are revalidated with `If-None-Match` / `If-Modified-Since`,
+    `immutable` urls (hashed discord assets etc.) are never revalidated
+
+    Raises
+    ------
+    ImageTooLarge
+        The body is larger than `max_size`, the download is aborted once that is known
+    """
+    if (cache := get_fetch_cache()) is None:
+        async with session.get(url) as r:
+            return FetchResult(await read_limited(r, max_size), r.content_type) if r.ok else None
+
+    key = hash_bytes(url.encode())
+    headers = {}
+
+    if (entry := await cache.aget(key)) is not None:
+        if immutable or time.time() - entry.created < REVALIDATE_AFTER:
+            return FetchResult(entry.data, entry.meta['content_type'])
+
+        if etag := entry.meta.get('etag'):
+            headers['If-None-Match'] = etag
+        if modified := entry.meta.get('last_modified'):
+            headers['If-Modified-Since'] = modified
+
+    async with session.get(url, headers=headers) as r:
+        if r.status == 304 and entry is not None:
+            data, meta = entry.data, entry.meta
+        elif r.ok:
+            data = await read_limited(r, max_size)
+            meta = {
+                'content_type': r.content_type,
+                'etag': r.headers.get('ETag'),
+                'last_modified': r.headers.get('Last-Modified'),
+            }
+            if 'no-store' in r.headers.get('Cache-Control', ''):
+                return FetchResult(data, r.content_type)
+        else:
+            return None
+
+    await cache.aput(key, data, **meta)
+    return FetchResult(data, meta['content_type'])
+
 class ColorConverter(commands.Converter):
     async def convert(self, ctx: BombContext, argument: str) -> Color:
         try:
@@ -43,18 +129,19 @@ class DefaultEmojiConverter(commands.Converter):
             return emoji
 
 class UrlConverter(commands.Converter):
-    async def find_tenor_gif(self, ctx: BombContext, response: ClientResponse) -> bytes:
+    async def find_tenor_gif(self, ctx: BombContext, response: FetchResult) -> bytes:
         bad_arg = commands.BadArgument('An Error occured when fetching the tenor GIF')
         try:
-            content = await response.text()
+            content = response.data.decode(errors='replace')
             if match := Regexes.TENOR_GIF_REGEX.search(content):
-                async with ctx.bot.session.get(match.group()) as gif:
-                    if gif.ok:
-                        return await gif.read()
-                    else:
-                        raise bad_arg
+                if gif := await fetch_url(ctx.bot.session, match.group()):
+                    return gif.data
+                else:
+                    raise bad_arg
             else:
                 raise bad_arg
+        except ImageTooLarge:
+            raise
         except Exception:
             raise bad_arg
 
@@ -64,11 +151,12 @@ class UrlConverter(commands.Converter):
 
         bad_arg = commands.BadArgument('An Error occured when fetching the imgur GIF')
         try:
-            async with ctx.bot.session.get(raw_url) as raw:
-                if raw.ok:
-                    return await raw.read()
-                else:
-                    raise bad_arg
+            if raw := await fetch_url(ctx.bot.session, raw_url):
+                return raw.data
+            else:
+                raise bad_arg
+        except ImageTooLarge:
+            raise
         except Exception:
             raise bad_arg
 
@@ -76,21 +164,22 @@ class UrlConverter(commands.Converter):
         bad_arg = commands.BadArgument('Invalid image URL')
         argument = argument.strip('<>')
         try:
-            async with ctx.bot.session.get(argument) as r:
-                if r.ok:
-                    if r.content_type.startswith('image/'):
-                        byt = await r.read()
-                        if r.content_type.startswith('image/svg'):
-                            byt = await image_mod.svg_to_png(byt)
-                        return byt
-                    elif Regexes.TENOR_PAGE_REGEX.fullmatch(argument):
-                        return await self.find_tenor_gif(ctx, r)
-                    elif imgur := Regexes.IMGUR_PAGE_REGEX.fullmatch(argument):
-                        return await self.find_imgur_img(ctx, imgur)
-                    else:
-                        raise bad_arg
+            if r := await fetch_url(ctx.bot.session, argument):
+                if r.content_type.startswith('image/'):
+                    byt = r.data
+                    if r.content_type.startswith('image/svg'):
+                        byt = await image_mod.svg_to_png(byt)
+                    return byt
+                elif Regexes.TENOR_PAGE_REGEX.fullmatch(argument):
+                    return await self.find_tenor_gif(ctx, r)
+                elif imgur := Regexes.IMGUR_PAGE_REGEX.fullmatch(argument):
+                    return await self.find_imgur_img(ctx, imgur)
                 else:
                     raise bad_arg
+            else:
+                raise bad_arg
+        except ImageTooLarge:
+            raise
         except Exception:
             raise bad_arg
 
@@ -108,6 +197,8 @@ class ImageConverter(commands.Converter):
         If all above fails, it repeats the above for references (replies)
         and also searches for embed thumbnails / images in references
 
+    Avatars, emojis and urls are downloaded through the fetch cache (see `fetch_url`)
+
     Raises
     ------
     ImageTooLarge
@@ -123,26 +214,38 @@ class ImageConverter(commands.Converter):
         UrlConverter,
     )
 
-    def check_size(self, byt: bytes, *, max_size: int = 15_000_000) -> None:
-        if (size := byt.__sizeof__()) > max_size:
+    def check_size(self, byt: bytes, *, max_size: int = MAX_IMAGE_SIZE) -> None:
+        if (size := len(byt)) > max_size:
             del byt
             raise ImageTooLarge(size, max_size)
 
-    async def converted_to_buffer(self, source: Argument) -> bytes:
+    async def read_asset(self, ctx: BombContext, asset: discord.Asset | discord.PartialEmoji) -> bytes:
+        # asset urls embed the avatar hash / emoji id, so their content never changes
+        if result := await fetch_url(ctx.bot.session, asset.url, immutable=True):
+            return result.data
+        return await asset.read()
+
+    async def converted_to_buffer(self, ctx: BombContext, source: Argument) -> bytes:
         if isinstance(source, (discord.Member, discord.User)):
-            source = await source.display_avatar.read()
+            source = await self.read_asset(ctx, source.display_avatar)
 
         elif isinstance(source, discord.PartialEmoji):
-            source = await source.read()
+            source = await self.read_asset(ctx, source)
 
         return source
 
-    async def get_attachments(self, ctx: BombContext, message: Optional[discord.Message] = None) -> Optional[bytes]:
+    async def get_attachments(
+        self,
+        ctx: BombContext,
+        message: Optional[discord.Message] = None,
+        *,
+        max_size: int = MAX_IMAGE_SIZE,
+    ) -> Optional[bytes]:
         source = None
         message = message or ctx.message
 
         if files := message.attachments:
-            source = await self.get_file_image(files)
+            source = await self.get_file_image(files, max_size=max_size)
 
         if (st := message.stickers) and source is None:
             source = await self.get_sticker_image(ctx, st)
@@ -165,9 +268,13 @@ class ImageConverter(commands.Converter):
                 except commands.BadArgument:
                     continue
 
-    async def get_file_image(self, files: list[discord.Attachment]) -> Optional[bytes]:
+    async def get_file_image(self, files: list[discord.Attachment], *, max_size: int = MAX_IMAGE_SIZE) -> Optional[bytes]:
         for file in files:
             if file.content_type and file.content_type.startswith('image/'):
+                # the size is known upfront, so oversized attachments are never downloaded
+                if file.size > max_size:
+                    raise ImageTooLarge(file.size, max_size)
+
                 byt = await file.read()
                 if file.content_type.startswith('image/svg'):
                     byt = await image_mod.svg_to_png(byt)
@@ -177,6 +284,11 @@ class ImageConverter(commands.Converter):
         for converter in self._converters:
             try:
                 source = await converter().convert(ctx, argument)
+            except ImageTooLarge as exc:
+                # `Optional[ImageConverter]` parameters swallow conversion errors and would fall back
+                # to the author's avatar, so `get_image` raises it again from the context
+                ctx.image_error = exc
+                raise
             except commands.BadArgument:
                 continue
             else:
@@ -187,26 +299,35 @@ class ImageConverter(commands.Converter):
             else:
                 return None
 
-        return await self.converted_to_buffer(source)
+        return await self.converted_to_buffer(ctx, source)
+
+    async def get_image(
+        self,
+        ctx: BombContext,
+        source: Optional[str | bytes],
+        *,
+        max_size: int = MAX_IMAGE_SIZE,
+    ) -> BytesIO:
+        if (error := getattr(ctx, 'image_error', None)) is not None:
+            raise error
 
-    async def get_image(self, ctx: BombContext, source: Optional[str | bytes], *, max_size: int = 15_000_000) -> BytesIO:
         if isinstance(source, str):
             source = await self.convert(ctx, source, raise_on_failure=False)
 
         if source is None:
-            source = await self.get_attachments(ctx)
+            source = await self.get_attachments(ctx, max_size=max_size)
 
             if (ref := ctx.message.reference) and source is None:
                 ref = ref.resolved
 
                 if not isinstance(ref, discord.DeletedReferencedMessage) and ref:
-                    source = await self.get_attachments(ctx, ref)
+                    source = await self.get_attachments(ctx, ref, max_size=max_size)
 
                     if source is None and ref.content:
                         source = await self.convert(ctx, ref.content.split()[0], raise_on_failure=False)
 
         if source is None:
-            source = await ctx.author.display_avatar.read()
+            source = await self.read_asset(ctx, ctx.author.display_avatar)
 
         self.check_size(source, max_size=max_size)
         return BytesIO(source)
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Runtime predictions of imaging jobs, used by the scheduler to pick a job's lane
+
+A job's runtime is modelled as a fixed overhead plus a per-function rate times the megapixels it renders
+(its pixel count times its frame count), the rates are calibrated from the runtimes of finished jobs
+"""
+from __future__ import annotations
+
+from typing import (
+    Final,
+    Optional,
+    NamedTuple,
+)
+from math import ceil
+import threading
+import pathlib
+import logging
+import json
+import os
+
+__all__: tuple[str, ...] = (
+    'JobSize',
+    'CostModel',
+    'configure_cost_model',
+    'get_cost_model',
+)
+
+# decoded pixels, summed over every frame, per unit of scheduler cost
+COST_UNIT_PIXELS: Final[int] = 2_000_000
+# seconds every job takes regardless of its size, e.g. handing it to a worker
+OVERHEAD_SECONDS: Final[float] = 0.05
+# seconds per megapixel of functions that have not been timed yet, and no other function has either
+DEFAULT_RATE: Final[float] = 0.1
+
+_log = logging.getLogger(__name__)
+
+
+class JobSize(NamedTuple):
+    """The work a job renders: `pixels` per frame over `frames` frames"""
+    pixels: int = 0
+    frames: int = 1
+
+    @property
+    def megapixels(self) -> float:
+        return self.pixels * self.frames / 1_000_000
+
+    @property
+    def cost(self) -> int:
+        """The job's weight in the scheduler's cost budget, at least 1"""
+        return max(ceil(self.pixels * self.frames / COST_UNIT_PIXELS), 1)
+
+
+class CostModel:
+    """Predicts the runtime of jobs per function, from exponential moving averages of their observed rates
+
+    Parameters
+    ----------
+    fast_seconds : float
+        jobs predicted to finish within this are sent to the scheduler's fast lane
+    alpha : float
+        the weight of a new observation in a function's moving average
+    path : Optional[str | os.PathLike]
+        a JSON file the rates are loaded from and saved to, so that they survive restarts
+    """
+
+    def __init__(
+        self,
+        *,
+        fast_seconds: float = 1.0,
+        alpha: float = 0.2,
+        path: Optional[str | os.PathLike] = None,
+    ) -> None:
+        self.fast_seconds = fast_seconds
+        self.alpha = alpha
+        self.path = pathlib.Path(path) if path else None
+
+        # `{key: seconds per megapixel}`
+        self._rates: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            self.load()
+
+    def rate(self, key: str) -> float:
+        """The calibrated rate of `key`, or the average rate of every function before it has been timed"""
+        with self._lock:
+            if (rate := self._rates.get(key)) is not None:
+                return rate
+            if self._rates:
+                return sum(self._rates.values()) / len(self._rates)
+        return DEFAULT_RATE
+
+    def predict(self, key: str, size: JobSize) -> float:
+        """The predicted runtime in seconds of the job `key` on an input of `size`"""
+        return OVERHEAD_SECONDS + self.rate(key) * size.megapixels
+
+    def is_fast(self, key: str, size: JobSize) -> bool:
+        return self.predict(key, size) <= self.fast_seconds
+
+    def observe(self, key: str, size: JobSize, seconds: float) -> None:
+        """Calibrates the rate of `key` with the runtime of one of its jobs"""
+        if size.megapixels <= 0:
+            return
+
+        rate = max(seconds - OVERHEAD_SECONDS, 0) / size.megapixels
+        with self._lock:
+            previous = self._rates.get(key)
+            self._rates[key] = rate if previous is None else previous + self.alpha * (rate - previous)
+
+    def rates(self) -> dict[str, float]:
+        with self._lock:
+            return self._rates.copy()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                rates = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            _log.warning(f'could not load imaging cost rates from {self.path}: {exc}')
+            return
+
+        with self._lock:
+            self._rates.update({key: float(rate) for key, rate in rates.items()})
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix('.tmp')
+        with open(temp, 'w') as f:
+            json.dump(self.rates(), f, indent=4, sort_keys=True)
+        os.replace(temp, self.path)
+
+
+_COST_MODEL: CostModel = CostModel()
+
+def configure_cost_model(
+    *,
+    fast_seconds: float = 1.0,
+    alpha: float = 0.2,
+    path: Optional[str | os.PathLike] = None,
+) -> CostModel:
+    """Replaces the cost model, the rates calibrated so far are carried over"""
+    global _COST_MODEL
+
+    rates = _COST_MODEL.rates()
+    _COST_MODEL = CostModel(fast_seconds=fast_seconds, alpha=alpha, path=path)
+
+    for key, rate in rates.items():
+        _COST_MODEL._rates.setdefault(key, rate)
+    return _COST_MODEL
+
+def get_cost_model() -> CostModel:
+    return _COST_MODEL
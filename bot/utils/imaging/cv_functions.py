@@ -7,6 +7,7 @@ import numpy as np
 from PIL import Image
 
 from ..helpers import get_asset
+from .generator import frame_generator
 from .image import (
     resize_cv_prop,
     get_closest_color,
@@ -56,23 +57,26 @@ def _gen_invert_frame(
         )
     return img
 
-def _colorize_lego_band(band: np.ndarray, color: int) -> np.ndarray:
-    band = band.astype(np.float32)
-    new = color - 133 + band
-    new[band < 33] = color - 100
-    new[band > 233] = color + 100
-    new[new < 0] = 0
-    new[new > 255] = 255
-    return new.astype(np.uint8)
-
-def _colorize_lego(img: np.ndarray, color: tuple[int, int, int, int]) -> np.ndarray:
-    red, green, blue = cv2.split(img)
-    return cv2.merge((
-        _colorize_lego_band(red, color[0]),
-        _colorize_lego_band(green, color[1]),
-        _colorize_lego_band(blue, color[2]),
-        np.full((30, 30), color[3], dtype=np.uint8),
-    ))
+def _build_lego_tables(brick: np.ndarray) -> np.ndarray:
+    """Colorizes every band of `brick` to all 256 possible values upfront
+
+    Returns
+    -------
+    np.ndarray
+        a `(bands, 256, h, w)` table, indexed by band and then by the pixel's value in that band
+    """
+    color = np.arange(256, dtype=np.int16)[:, None, None]
+    tables = []
+
+    for band in cv2.split(brick):
+        band = band.astype(np.int16)
+        new = color - 133 + band
+        new = np.where(band < 33, color - 100, new)
+        new = np.where(band > 233, color + 100, new)
+        tables.append(np.clip(new, 0, 255).astype(np.uint8))
+    return np.stack(tables)
+
+LEGO_TABLES: np.ndarray = _build_lego_tables(LEGO)
 
 @pil_image()
 @to_array('RGBA', cv2.COLOR_RGBA2BGRA)
@@ -82,17 +86,16 @@ def lego(_, img: np.ndarray, *, size: int = 40) -> np.ndarray:
         resampling=cv2.INTER_AREA,
     )
     h, w, *_ = img.shape
+    brick_h, brick_w = LEGO.shape[:2]
+
+    # gather every brick at once through the per-band tables, as an (h, w, brick_h, brick_w, 4) view
+    bricks = np.empty((h, w, brick_h, brick_w, 4), dtype=np.uint8)
+    for band, table in enumerate(LEGO_TABLES):
+        bricks[..., band] = table[img[..., band]]
+    bricks[..., 3] = img[..., 3, None, None]
+    bricks[img[..., 3] == 0] = 0
 
-    base = np.zeros((h * 30, w * 30, 4), dtype=np.uint8)
-    x, y = 0, 0
-    for row in img:
-        for px in row:
-            if px[-1] != 0:
-                base[y:y + 30, x:x + 30] = _colorize_lego(LEGO, px)
-            x += 30
-        x = 0
-        y += 30
-    return base
+    return bricks.transpose(0, 2, 1, 3, 4).reshape(h * brick_h, w * brick_w, 4)
 
 @pil_image()
 @to_array()
@@ -108,7 +111,7 @@ def lego_speed(_, img: np.ndarray, *, size: int = 40) -> np.ndarray:
     blended = cv2.addWeighted(img, 0.7, base, 0.6, 0)
     return blended
 
-@pil_image(width=400, process_all_frames=False)
+@pil_image(width=400, process_all_frames=False, cache=False)
 @to_array('RGBA', cv2.COLOR_RGBA2BGRA)
 def invert_scan(_, img: np.ndarray, *, spread: bool = True, bar_span: int = 12, fuzz_span: float = 0.8) -> list[np.ndarray]:
     width = img.shape[1]
@@ -184,19 +187,18 @@ def cornerdetect(_, img: np.ndarray, *, dot_size: int = 3) -> np.ndarray:
         cv2.circle(img, (x, y), dot_size, color, -1)
     return img
 
-@pil_image()
+@pil_image(process_all_frames=False)
+@frame_generator(range(1, 50, 2), mirror=True)
 @to_array('RGBA', cv2.COLOR_RGBA2BGRA)
-def dilate(_, img: np.ndarray) -> list[np.ndarray]:
-    frames = [cv2.dilate(img, np.ones((i, i), np.uint8)) for i in range(1, 50, 2)]
-    frames += reversed(frames)
-    return frames
+def dilate(_, img: np.ndarray, i: int) -> np.ndarray:
+    return cv2.dilate(img, np.ones((i, i), np.uint8))
 
 @pil_image()
 @to_array('RGBA', cv2.COLOR_RGBA2BGRA)
 def canny(_, img: np.ndarray) -> np.ndarray:
     return cv2.Canny(img, 100, 200)
 
-@pil_image()
+@pil_image(process_all_frames=False)
 @to_array('RGBA', cv2.COLOR_RGBA2BGRA)
 def ascii(_, img: np.ndarray, *, size: int = 10, invert: bool = True) -> str:
     w, h, _ = img.shape
@@ -1,12 +1,17 @@
 
+from typing import Optional
+
 import humanize
+from discord.ext import commands
 
 __all__: tuple[str] = (
     'BaseImageException',
     'TooManyFrames',
     'InvalidColor',
     'ImageTooLarge',
+    'ImageDimensionsTooLarge',
     'ImageProcessTimeout',
+    'ImagingQueueFull',
 )
 
 
@@ -31,7 +36,7 @@ class InvalidColor(BaseImageException):
         self.message = f'`{argument}` is not a valid color!'
         super().__init__(self.message)
 
-class ImageTooLarge(BaseImageException):
+class ImageTooLarge(BaseImageException, commands.BadArgument):
 
     def __init__(self, size: int, max_size: int = 15_000_000) -> None:
         MIL = 1_000_000
@@ -41,9 +46,36 @@ class ImageTooLarge(BaseImageException):
         )
         super().__init__(self.message)
 
+class ImageDimensionsTooLarge(BaseImageException):
+
+    def __init__(
+        self,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        frames: int = 1,
+        *,
+        max_pixels: int,
+    ) -> None:
+        MIL = 1_000_000
+        if width and height:
+            frames_text = f' x `{frames}` frames' if frames > 1 else ''
+            self.message = (
+                f'The dimensions of the provided image (`{width}x{height}`{frames_text}) '
+                f'exceed the limit of `{max_pixels / MIL:g}` megapixels'
+            )
+        else:
+            self.message = f'The dimensions of the provided image exceed the limit of `{max_pixels / MIL:g}` megapixels'
+        super().__init__(self.message)
+
 class ImageProcessTimeout(BaseImageException):
 
     def __init__(self, timeout: int) -> None:
         timeout = humanize.precisedelta(timeout)
         self.message = f'Image Process took too long and timed out, the timeout is `{timeout}`'
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class ImagingQueueFull(BaseImageException):
+
+    def __init__(self, queued: int) -> None:
+        self.message = f'Too many images are being processed right now (`{queued}` queued), try again in a bit'
+        super().__init__(self.message)
@@ -0,0 +1,163 @@
+"""
+Shared memory transfer of decoded frames between worker processes and the bot
+
+A worker packs the RGBA frames it rendered into one `multiprocessing.shared_memory` block
+and only sends back a `SharedFrames` handle to it, instead of pickling every array through the pool's pipe.
+The receiver maps the block and reads the frames in place, it owns the block from then on
+and is responsible for unlinking it, which `attach` does once it is done with the frames
+
+`/dev/shm` is small in containers (64 MiB by default under docker) and running out of it kills the worker
+writing to the block, so frames that do not comfortably fit in it are sent back as `PickledFrames` instead,
+which have the same interface but are pickled through the pipe
+"""
+from __future__ import annotations
+
+from typing import (
+    Final,
+    Iterable,
+    Iterator,
+    Optional,
+    NamedTuple,
+)
+from multiprocessing import shared_memory
+import contextlib
+import os
+
+import numpy as np
+
+__all__: tuple[str, ...] = (
+    'SharedFrames',
+    'PickledFrames',
+    'PackedFrames',
+    'shm_free_bytes',
+    'pack_frames',
+)
+
+# frames are packed at offsets aligned to this, so that every view is aligned too
+ALIGNMENT: Final[int] = 64
+# where posix shared memory blocks live
+SHM_PATH: Final[str] = '/dev/shm'
+# the share of the free shared memory one block may take, the other workers may be packing their chunks at the same time
+SHM_MAX_SHARE: Final[float] = 0.5
+
+
+class SharedFrame(NamedTuple):
+    offset: int
+    shape: tuple[int, ...]
+    delay: Optional[int]
+
+
+class SharedFrames(NamedTuple):
+    """A picklable handle to `(uint8 array, delay)` frames packed into one shared memory block
+
+    Attributes
+    ----------
+    name : str
+        the name of the shared memory block
+    frames : tuple[SharedFrame, ...]
+        the offset, shape and delay of every frame in the block
+    """
+    name: str
+    frames: tuple[SharedFrame, ...]
+
+    @staticmethod
+    def block_size(frames: Iterable[tuple[np.ndarray, Optional[int]]]) -> int:
+        """The size of the block `frames` are packed into"""
+        return sum(-(-array.nbytes // ALIGNMENT) * ALIGNMENT for array, _ in frames)
+
+    @classmethod
+    def pack(cls, frames: Iterable[tuple[np.ndarray, Optional[int]]]) -> SharedFrames:
+        """Copies `frames` into a new block, which outlives this process' mapping of it until it is unlinked"""
+        frames = list(frames)
+
+        layout = []
+        size = 0
+        for array, delay in frames:
+            layout.append(SharedFrame(size, array.shape, delay))
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        # blocks cannot be empty
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            for (array, _), frame in zip(frames, layout):
+                view = np.ndarray(array.shape, np.uint8, block.buf, frame.offset)
+                view[...] = array
+                del view
+        except BaseException:
+            block.close()
+            block.unlink()
+            raise
+
+        block.close()
+        return cls(block.name, tuple(layout))
+
+    @contextlib.contextmanager
+    def attach(self) -> Iterator[list[tuple[np.ndarray, Optional[int]]]]:
+        """Yields read-only views of the frames, the block is unlinked on exit
+
+        The views must not be used past the block, copy frames that have to be kept
+        """
+        block = shared_memory.SharedMemory(self.name)
+        try:
+            frames = []
+            for frame in self.frames:
+                view = np.ndarray(frame.shape, np.uint8, block.buf, frame.offset)
+                view.flags.writeable = False
+                frames.append((view, frame.delay))
+
+            yield frames
+        finally:
+            frames.clear()
+            view = None
+            try:
+                block.close()
+            except BufferError:
+                # a view is still referenced somewhere, the mapping is released along with it instead
+                pass
+            block.unlink()
+
+    def unlink(self) -> None:
+        """Frees the block without reading it, e.g. when the job it belongs to failed"""
+        with contextlib.suppress(FileNotFoundError):
+            block = shared_memory.SharedMemory(self.name)
+            block.close()
+            block.unlink()
+
+
+class PickledFrames(NamedTuple):
+    """`(uint8 array, delay)` frames sent back by value, for when they do not fit in shared memory
+
+    Attributes
+    ----------
+    frames : list[tuple[np.ndarray, Optional[int]]]
+        the frames themselves
+    """
+    frames: list[tuple[np.ndarray, Optional[int]]]
+
+    @contextlib.contextmanager
+    def attach(self) -> Iterator[list[tuple[np.ndarray, Optional[int]]]]:
+        """Yields the frames, like `SharedFrames.attach`"""
+        yield self.frames
+
+    def unlink(self) -> None:
+        """Nothing to free, the frames are garbage collected"""
+
+
+PackedFrames = SharedFrames | PickledFrames
+
+def shm_free_bytes() -> Optional[int]:
+    """The space left for shared memory blocks, `None` if it cannot be told (e.g. on windows, where they are paged)"""
+    try:
+        stats = os.statvfs(SHM_PATH)
+    except (AttributeError, OSError):
+        return None
+    return stats.f_bavail * stats.f_frsize
+
+def pack_frames(frames: Iterable[tuple[np.ndarray, Optional[int]]]) -> PackedFrames:
+    """Packs `frames` into shared memory if they fit in their share of it, otherwise into `PickledFrames`"""
+    frames = list(frames)
+
+    free = shm_free_bytes()
+    if free is not None and SharedFrames.block_size(frames) > free * SHM_MAX_SHARE:
+        return PickledFrames(frames)
+    return SharedFrames.pack(frames)
@@ -0,0 +1,144 @@
+"""
+Declarative frame generators, for effects that synthesize an animation out of a single image
+
+An effect describes the values it sweeps over and how one frame is rendered for a value,
+every frame only depends on the source and its own value,
+so the imaging decorators are free to render chunks of the sweep in separate workers
+"""
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterator,
+    Optional,
+    Sequence,
+)
+import functools
+
+from PIL import Image
+from wand.image import BaseImage, Image as WandImage
+
+from .workers import check_deadline
+from .metrics import span
+
+if TYPE_CHECKING:
+    from ..context import BombContext
+    from .pipeline import FrameChunk, FrameSink
+
+__all__: tuple[str, ...] = (
+    'FrameGenerator',
+    'frame_generator',
+)
+
+
+def _copy(image: Image.Image | WandImage) -> Image.Image | WandImage:
+    return image.clone() if isinstance(image, BaseImage) else image.copy()
+
+
+class FrameGenerator:
+    """An animation rendered from one source image, one frame per value of `sweep`
+
+    Calling it renders every frame in order, like the plain function it replaces
+
+    Parameters
+    ----------
+    render : Callable
+        `render(ctx, image, value, *args, **kwargs)`, draws the frame of `value` on its own copy of the source
+    sweep : Sequence[Any]
+        the values frames are rendered for
+    delay : Optional[int]
+        the delay of every frame in milliseconds
+    mirror : bool
+        whether the animation plays the sweep back in reverse after it
+    prepare : Optional[Callable]
+        `prepare(ctx, image, *args, **kwargs)`, applied to the source once before rendering
+    """
+
+    def __init__(
+        self,
+        render: Callable[..., Image.Image | WandImage],
+        sweep: Sequence[Any],
+        *,
+        delay: Optional[int] = None,
+        mirror: bool = False,
+        prepare: Optional[Callable[..., Image.Image | WandImage]] = None,
+    ) -> None:
+        self.render = render
+        self.sweep = sweep
+        self.delay = delay
+        self.mirror = mirror
+        self.prepare = prepare
+        functools.update_wrapper(self, render)
+
+    def __len__(self) -> int:
+        """The amount of unique frames, the mirrored half not included"""
+        return len(self.sweep)
+
+    def __call__(
+        self,
+        ctx: Optional[BombContext],
+        image: Image.Image | WandImage,
+        *args: Any,
+        **kwargs: Any,
+    ) -> list[Image.Image | WandImage]:
+        frames = list(self.iter_frames(ctx, image, args, kwargs))
+        if self.mirror:
+            frames += reversed(frames)
+        return frames
+
+    def iter_frames(
+        self,
+        ctx: Optional[BombContext],
+        image: Image.Image | WandImage,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+        *,
+        chunk: Optional[FrameChunk] = None,
+    ) -> Iterator[Image.Image | WandImage]:
+        """Renders the frames of the sweep (only those in `chunk` if given) in order,
+        checking the job's deadline between frames
+        """
+        if self.prepare is not None:
+            image = self.prepare(ctx, image, *args, **kwargs)
+
+        start, stop = chunk or (0, len(self))
+        for value in self.sweep[start:stop]:
+            check_deadline()
+            with span('effect'):
+                frame = self.render(ctx, _copy(image), value, *args, **kwargs)
+            yield frame
+
+    def generate(
+        self,
+        ctx: Optional[BombContext],
+        image: Image.Image | WandImage,
+        sink: FrameSink,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+        *,
+        chunk: Optional[FrameChunk] = None,
+    ) -> FrameSink:
+        """Appends the rendered frames to `sink`,
+        which is expected to have been created with `mirror=generator.mirror`
+        """
+        for frame in self.iter_frames(ctx, image, args, kwargs, chunk=chunk):
+            with span('encode'):
+                sink.append(frame, self.delay)
+        return sink
+
+
+def frame_generator(
+    sweep: Sequence[Any],
+    *,
+    delay: Optional[int] = None,
+    mirror: bool = False,
+    prepare: Optional[Callable[..., Image.Image | WandImage]] = None,
+) -> Callable[[Callable[..., Image.Image | WandImage]], FrameGenerator]:
+    """Turns a function rendering a single frame into a `FrameGenerator`,
+    meant to be placed below `pil_image` / `wand_image`
+    """
+    def decorator(render: Callable[..., Image.Image | WandImage]) -> FrameGenerator:
+        return FrameGenerator(render, sweep, delay=delay, mirror=mirror, prepare=prepare)
+    return decorator
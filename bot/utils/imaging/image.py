@@ -11,11 +11,15 @@ from typing import (
     ParamSpec,
     TypeVar,
     Iterable,
+    Iterator,
+    NamedTuple,
     TYPE_CHECKING,
 )
-from itertools import cycle
+from itertools import cycle, chain
 from io import BytesIO
 from math import ceil
+import contextlib
+import functools
 import asyncio
 import time
 
@@ -31,11 +35,43 @@ from PIL import (
     ImageSequence,
 )
 from wand.drawing import Drawing
-from wand.image import Image as WandImage
+from wand.image import BaseImage, Image as WandImage
 from wand.sequence import Sequence
 
+from .framebuffer import PackedFrames
+from .cache import CacheEntry, SingleFlight, get_result_cache, result_key
 from .converter import ImageConverter
+from .probe import ImageHeader, probe_image, check_image_header, draft_size
+from .output import OutputOptions, resolve_output
+from .generator import FrameGenerator
+from .pipeline import (
+    Frame,
+    FrameChunk,
+    FrameSink,
+    ArraySink,
+    WandGifSink,
+    encode_frames,
+    fit_animation,
+    fit_image,
+    get_animation_sink,
+    iter_pil_frames,
+    iter_wand_frames,
+    run_frame_pipeline,
+)
 from .exceptions import TooManyFrames, ImageProcessTimeout
+from .metrics import REGISTRY, collect_stages, record, span
+from .scheduler import get_scheduler
+from .costs import JobSize, get_cost_model
+from .workers import (
+    Deadline,
+    job_deadline,
+    check_deadline,
+    register_job,
+    get_process_pool,
+    pool_size,
+    is_picklable,
+    run_in_process,
+)
 from ..helpers import to_thread as to_thread_deco
 
 if TYPE_CHECKING:
@@ -50,6 +86,11 @@ if TYPE_CHECKING:
 
     CMD = TypeVar('CMD', bound=commands.Command)
 
+    ImageJob: TypeAlias = Callable[
+        [Optional[BombContext], BytesIO, tuple[Any, ...], dict[str, Any], Optional[OutputOptions]],
+        Any,
+    ]
+
     PillowFunction: TypeAlias = Callable[Concatenate[BombContext, Image.Image, P], R]
     PillowThreaded: TypeAlias = Callable[Concatenate[BombContext, Image.Image, P], Awaitable[R]]
 
@@ -73,6 +114,9 @@ __all__: tuple[str, ...] = (
     'resize_wand_prop',
     'resize_cv_prop',
     'process_wand_gif',
+    'process_pil_gif',
+    'open_pil_image',
+    'open_wand_image',
     'wand_save_list',
     'save_wand_image',
     'save_pil_image',
@@ -84,6 +128,14 @@ __all__: tuple[str, ...] = (
 
 MAX_FRAMES: Final[int] = 200
 FORMATS: Final[tuple[str, ...]] = ('png', 'gif')
+# animations shorter than this are not worth splitting across workers
+PARALLEL_MIN_FRAMES: Final[int] = 16
+# frames of generators are rendered from scratch, so they are split up sooner
+PARALLEL_MIN_GENERATED: Final[int] = 8
+MIN_CHUNK_FRAMES: Final[int] = 4
+
+# image jobs in flight by result key, shared by identical jobs invoked while they run
+_IN_FLIGHT: Final[SingleFlight] = SingleFlight()
 
 
 @to_thread_deco
@@ -108,13 +160,230 @@ async def run_threaded(
     *,
     timeout: int = 600
 ) -> R | R_:
+    deadline = Deadline(timeout)
+    submitted = time.perf_counter()
+
+    def run(arg: BytesIO) -> R | R_:
+        with job_deadline(deadline), collect_stages() as stages:
+            record('queue', time.perf_counter() - submitted)
+            result = func(arg)
+
+        REGISTRY.observe_stages(stages)
+        return result
+
     try:
         return await asyncio.wait_for(
-            asyncio.to_thread(func, argument),
+            asyncio.to_thread(run, argument),
             timeout=timeout,
         )
     except asyncio.TimeoutError as exc:
         raise ImageProcessTimeout(timeout) from exc
+    finally:
+        # threads cannot be killed, this makes the job bail out at its next `check_deadline`
+        deadline.cancel()
+
+class FrameSplit(NamedTuple):
+    """How `run_image_job` splits an animated job into chunks of frames rendered by separate workers
+
+    Attributes
+    ----------
+    key : str
+        the registered job rendering a `FrameChunk` of the source into `ArraySink` arrays
+    frames : int
+        the amount of frames of the source, or of unique frames of a `FrameGenerator`
+    to_file : bool
+        whether the reassembled animation is returned as a `discord.File`
+    mirror : bool
+        whether the frames are played back in reverse after being played
+    min_frames : int
+        the amount of frames below which the job is not split
+    """
+    key: str
+    frames: int
+    to_file: bool = True
+    mirror: bool = False
+    min_frames: int = PARALLEL_MIN_FRAMES
+
+
+def split_frames(frames: int, workers: int) -> list[FrameChunk]:
+    """Splits `frames` into contiguous chunks, one per worker but of at least `MIN_CHUNK_FRAMES` frames"""
+    chunks = max(min(workers, frames // MIN_CHUNK_FRAMES), 1)
+    return [FrameChunk(frames * i // chunks, frames * (i + 1) // chunks) for i in range(chunks)]
+
+async def run_frames_parallel(
+    split: FrameSplit,
+    data: bytes,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    *,
+    options: Optional[OutputOptions] = None,
+    workers: Optional[int] = None,
+    timeout: int = 600,
+) -> discord.File | BytesIO:
+    """Renders the chunks of `split` across `workers` of the process pool (all of them by default),
+    then encodes the frames in their original order and with their original delays
+
+    Workers send their frames back through shared memory (unless it is running out),
+    which is unlinked once encoded or if the job fails
+    """
+    tasks = [
+        asyncio.ensure_future(run_in_process(split.key, data, args, kwargs, options=chunk, timeout=timeout))
+        for chunk in split_frames(split.frames, workers or pool_size())
+    ]
+    try:
+        chunks: list[PackedFrames] = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None:
+                task.result().unlink()
+        raise
+
+    def encode() -> discord.File | BytesIO:
+        with contextlib.ExitStack() as stack, collect_stages() as stages:
+            # unlinks the chunks that are not attached yet if attaching one fails
+            for chunk in chunks:
+                stack.callback(chunk.unlink)
+            frames = [stack.enter_context(chunk.attach()) for chunk in chunks]
+
+            result = encode_frames(chain.from_iterable(frames), mirror=split.mirror, file=split.to_file, options=options)
+            frames.clear()
+
+        REGISTRY.observe_stages(stages)
+        return result
+
+    return await asyncio.to_thread(encode)
+
+def _from_cache_entry(entry: CacheEntry) -> discord.File | BytesIO:
+    if filename := entry.meta.get('filename'):
+        return discord.File(BytesIO(entry.data), filename)
+    return BytesIO(entry.data)
+
+async def _execute_image_job(
+    ctx: BombContext,
+    key: str,
+    job: ImageJob,
+    image: BytesIO,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    *,
+    options: Optional[OutputOptions] = None,
+    split: Optional[FrameSplit] = None,
+    size: JobSize = JobSize(),
+    process: bool = True,
+    timeout: int = 600,
+) -> Any:
+    notices: list[discord.Message] = []
+
+    async def on_queued(position: int) -> None:
+        with contextlib.suppress(discord.HTTPException):
+            notices.append(await ctx.reply(f'Queued at position `{position}`, hang tight...', mention_author=False))
+
+    guild = getattr(ctx, 'guild', None)
+    cost_model = get_cost_model()
+    fast = cost_model.is_fast(key, size)
+
+    process = process and get_process_pool() is not None and is_picklable(args, kwargs)
+    # a split job holds a scheduler slot for every worker its chunks occupy
+    workers = 1
+    if process and split is not None and split.frames >= split.min_frames and pool_size() > 1:
+        workers = len(split_frames(split.frames, pool_size()))
+
+    async with get_scheduler().slot(
+        guild and guild.id, size.cost, fast=fast, workers=workers, on_queued=on_queued,
+    ) as workers:
+        for notice in notices:
+            with contextlib.suppress(discord.HTTPException):
+                await notice.delete()
+
+        start = time.perf_counter()
+        try:
+            if process:
+                if split is not None and workers > 1:
+                    result = await run_frames_parallel(
+                        split, image.getvalue(), args, kwargs, options=options, workers=workers, timeout=timeout,
+                    )
+                else:
+                    result = await run_in_process(key, image.getvalue(), args, kwargs, options=options, timeout=timeout)
+            else:
+                result = await run_threaded(
+                    lambda buf: job(ctx, buf, args, kwargs, options),
+                    image,
+                    timeout=timeout,
+                )
+        except ImageProcessTimeout:
+            # the job would have taken at least this long, which the cost model has to learn most of all,
+            # other failures (e.g. bad input or cancellation) say nothing about the job's runtime
+            cost_model.observe(key, size, max(time.perf_counter() - start, timeout))
+            raise
+        cost_model.observe(key, size, time.perf_counter() - start)
+    return result
+
+async def run_image_job(
+    ctx: BombContext,
+    key: str,
+    job: ImageJob,
+    image: BytesIO,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    *,
+    options: Optional[OutputOptions] = None,
+    split: Optional[FrameSplit] = None,
+    size: JobSize = JobSize(),
+    process: bool = True,
+    cache: bool = True,
+    timeout: int = 600,
+) -> Any:
+    """Runs a registered imaging job in the process pool if one is running,
+    otherwise (or if the job's arguments cannot be pickled) falls back to a thread
+
+    Long animations are rendered in chunks across the pool's workers if `split` is given
+
+    Jobs wait for their turn in the scheduler, in the fast lane if the cost model predicts them to be quick on `size`,
+    the invoker is told their position if queued, their runtime then calibrates the cost model
+
+    Encoded outputs are stored in the result cache, keyed on the input bytes, function, arguments and `options`
+    (which hold the guild's format and upload limit),
+    jobs whose output is random must pass `cache=False` so that every invocation renders its own;
+    identical jobs of a guild running at the same time are only run once and share the encoded output,
+    the first of them is the one scheduled (and told its queue position), on behalf of its guild
+    """
+    execute = functools.partial(
+        _execute_image_job, ctx, key, job, image, args, kwargs,
+        options=options, split=split, size=size, process=process, timeout=timeout,
+    )
+    if not cache:
+        # nondeterministic jobs are neither cached nor coalesced
+        return await execute()
+
+    cache_key = await asyncio.to_thread(result_key, key, image.getvalue(), args, kwargs, options)
+    result_cache = get_result_cache()
+
+    if result_cache is not None and (entry := await result_cache.aget(cache_key)) is not None:
+        return _from_cache_entry(entry)
+
+    async def run() -> CacheEntry | Any:
+        result = await execute()
+
+        if isinstance(result, discord.File):
+            data, meta = result.fp.getvalue(), {'filename': result.filename}
+        elif isinstance(result, BytesIO):
+            data, meta = result.getvalue(), {}
+        else:
+            return result
+
+        if result_cache is not None:
+            return await result_cache.aput(cache_key, data, **meta)
+        return CacheEntry(data, meta, time.time())
+
+    # jobs are only coalesced within a guild, so that every guild is charged by the scheduler for its own jobs
+    guild = getattr(ctx, 'guild', None)
+    flight_key = f'{cache_key}:{guild and guild.id}'
+
+    # every caller gets its own file object over the shared bytes
+    result = await _IN_FLIGHT.do(flight_key, run)
+    return _from_cache_entry(result) if isinstance(result, CacheEntry) else result
 
 def check_frame_amount(img: Image.Image | WandImage, max_frames: int = MAX_FRAMES) -> None:
     if isinstance(img, Image.Image):
@@ -231,6 +500,7 @@ def process_wand_gif(
     check_frame_amount(image, max_frames)
 
     for i, frame in enumerate(image.sequence):
+        check_deadline()
         result = func(ctx, frame, *args, **kwargs)
         result.dispose = 'background'
         image.sequence[i] = result
@@ -239,6 +509,23 @@ def process_wand_gif(
     image.format = 'GIF'
     return image
 
+def process_pil_gif(
+    image: Image.Image | list[Image.Image],
+    func: PillowFunction,
+    ctx: BombContext,
+    *args: Any,
+    **kwargs: Any,
+) -> list[Image.Image]:
+    """`ImageSequence.all_frames` but checks the job's deadline between frames"""
+
+    frames = image if isinstance(image, list) else ImageSequence.Iterator(image)
+
+    result = []
+    for frame in frames:
+        check_deadline()
+        result.append(func(ctx, frame.copy(), *args, **kwargs))
+    return result
+
 def resize_pil_prop(
     image: Image.Image,
     width: Optional[int] = None,
@@ -300,6 +587,7 @@ def wand_save_list(
     base = WandImage()
 
     for i, frame in enumerate(frames):
+        check_deadline()
 
         if is_pil:
             frame = np.asarray(frame.convert('RGBA'))
@@ -320,12 +608,34 @@ def wand_save_list(
     return base
 
 
+def _iter_saved_frames(
+    image: WandImage | list[Image.Image | WandImage] | ImageSequence.Iterator,
+    duration: Duration = None,
+) -> Iterator[Frame]:
+    """The frames given to `save_wand_image` with their delays in milliseconds,
+    `duration` is in milliseconds for pillow frames and centiseconds for wand ones (like `wand_save_list`)
+    """
+    if isinstance(image, WandImage):
+        yield from iter_wand_frames(image)
+        return
+
+    for i, frame in enumerate(image):
+        delay = duration[i] if isinstance(duration, list) else duration
+
+        if isinstance(frame, BaseImage):
+            delay = (delay if delay is not None else frame.delay) * 10
+        yield Frame(frame, delay)
+
 def save_wand_image(
     image: WandImage | list[Image.Image | WandImage] | ImageSequence.Iterator,
     *,
     duration: Duration = None,
     file: bool = True,
+    options: Optional[OutputOptions] = None,
 ) -> discord.File | BytesIO:
+    """Saves `image` as a PNG or a GIF, animations are encoded by pillow instead
+    when `options` asks for another animation format
+    """
 
     is_list = isinstance(image, (list, ImageSequence.Iterator))
 
@@ -335,22 +645,42 @@ def save_wand_image(
         len(getattr(image, 'sequence', [])) > 1
     )
 
-    if is_list:
-        image = wand_save_list(image, duration)
+    if is_gif and options is not None and options.format != 'gif':
+        with get_animation_sink(options)() as sink:
+            for frame, delay in _iter_saved_frames(image, duration):
+                with span('encode'):
+                    sink.append(frame, delay)
+            result = sink.save(file=file, options=options)
+
+        if not is_list:
+            image.close()
+        return result
 
-    elif is_gif:
-        image.format = 'GIF'
-        image.dispose = 'background'
+    with span('encode') as encode:
+        if is_list:
+            image = wand_save_list(image, duration)
 
-    output = BytesIO()
-    image.save(file=output)
-    output.seek(0)
+        elif is_gif:
+            image.format = 'GIF'
+            image.dispose = 'background'
 
-    image.close()
-    del image
+        output = BytesIO()
+        image.save(file=output)
+        output.seek(0)
+
+        image.close()
+        del image
+
+        if is_gif:
+            output, format = fit_animation(output, 'gif', options)
+            extension = get_animation_sink(options and options._replace(format=format)).extension
+        else:
+            output = fit_image(output, options)
+            extension = FORMATS[0]
+        encode.nbytes = output.getbuffer().nbytes
 
     if file:
-        output = discord.File(output, f'output.{FORMATS[is_gif]}')
+        output = discord.File(output, f'output.{extension}')
     return output
 
 
@@ -359,26 +689,153 @@ def save_pil_image(
     *,
     duration: Optional[int] = None,
     file: bool = True,
+    sink: Optional[type[FrameSink]] = None,
+    options: Optional[OutputOptions] = None,
 ) -> discord.File | BytesIO:
+    """Saves `image` as a PNG, or lists of frames and animated images as an animation
+    encoded by `sink` (by default the one for the format `options` asks for)
+    """
+
+    if isinstance(image, list) or getattr(image, 'is_animated', False):
+        frames = image if isinstance(image, list) else ImageSequence.Iterator(image)
 
-    if is_gif := isinstance(image, list):
-        return save_wand_image(image, duration=duration)
+        with (sink or get_animation_sink(options))(duration=duration) as encoder:
+            for frame in frames:
+                with span('encode'):
+                    encoder.append(frame)
+            return encoder.save(file=file, options=options)
 
-    elif is_gif := getattr(image, 'is_animated', False):
-        return save_wand_image(ImageSequence.Iterator(image), duration=duration)
+    with span('encode') as encode:
+        output = BytesIO()
+        image.save(output, format='PNG')
+        output.seek(0)
 
-    output = BytesIO()
-    image.save(output, format='PNG')
-    output.seek(0)
+        image.close()
+        del image
 
-    image.close()
-    del image
+        output = fit_image(output, options)
+        encode.nbytes = output.getbuffer().nbytes
 
     if file:
-        output = discord.File(output, f'output.{FORMATS[is_gif]}')
+        output = discord.File(output, 'output.png')
     return output
 
 
+def open_pil_image(
+    buffer: BytesIO,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> Image.Image:
+    """Opens `buffer` and decodes its first frame, large JPEGs are decoded in draft mode at a reduced scale"""
+    with span('decode', nbytes=buffer.getbuffer().nbytes):
+        image = Image.open(buffer)
+
+        if image.format == 'JPEG' and (size := draft_size(ImageHeader(image.format, *image.size, 1), width, height)):
+            image.draft(None, size)
+        image.load()
+    return image
+
+def open_wand_image(
+    buffer: BytesIO,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> WandImage:
+    """Reads `buffer`, large JPEGs are decoded at a reduced scale through the `jpeg:size` hint"""
+    image = WandImage()
+
+    if size := draft_size(probe_image(buffer.getvalue()), width, height):
+        image.options['jpeg:size'] = '{}x{}'.format(*size)
+
+    with span('decode', nbytes=buffer.getbuffer().nbytes):
+        image.read(file=buffer)
+    return image
+
+async def probe_source(image: BytesIO, *, max_frames: Optional[int] = None) -> Optional[ImageHeader]:
+    """Rejects sources that are too large to decode, based on their headers only"""
+    header = await asyncio.to_thread(probe_image, image.getvalue())
+    check_image_header(header, max_frames=max_frames)
+    return header
+
+
+def _target_size(
+    image: Image.Image | WandImage,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> Optional[tuple[int, int]]:
+    if width and height:
+        return width, height
+    elif width or height:
+        return _get_prop_size(image, width, height)
+    return None
+
+def _is_pil_gif(image: Image.Image) -> bool:
+    return getattr(image, 'is_animated', False) or str(image.format).lower() == 'gif'
+
+def _is_wand_gif(image: WandImage) -> bool:
+    return len(image.sequence) > 1 or str(image.format).lower() == 'gif'
+
+def _frame_split(
+    key: str,
+    func: Callable[..., Any],
+    header: Optional[ImageHeader],
+    *,
+    to_file: bool,
+    parallel: bool,
+) -> Optional[FrameSplit]:
+    if isinstance(func, FrameGenerator):
+        return FrameSplit(key, len(func), to_file, mirror=func.mirror, min_frames=PARALLEL_MIN_GENERATED)
+
+    if parallel and header is not None and header.frames > 1:
+        return FrameSplit(key, header.frames, to_file)
+    return None
+
+def _job_size(
+    func: Callable[..., Any],
+    header: Optional[ImageHeader],
+    *,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    all_frames: bool = True,
+) -> JobSize:
+    """The work `func` renders on the source of `header`, at the size it gets resized to"""
+    if header is None:
+        return JobSize()
+
+    if width and height:
+        pixels = width * height
+    elif width:
+        pixels = width * ceil(width / header.width * header.height)
+    elif height:
+        pixels = ceil(height / header.height * header.width) * height
+    else:
+        pixels = header.pixels
+
+    if isinstance(func, FrameGenerator):
+        return JobSize(pixels, len(func))
+    return JobSize(pixels, header.frames if all_frames else 1)
+
+def _generator_source(
+    image: Image.Image | WandImage,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> Image.Image | WandImage:
+    """The (resized) first frame of `image`, which `FrameGenerator`s render from"""
+    if isinstance(image, WandImage):
+        with image:
+            source = WandImage(image.sequence[0])
+        source.background_color = 'none'
+
+        if width or height:
+            with span('resize'):
+                return resize_wand_prop(source, width, height)
+        return source
+
+    if width or height:
+        with span('resize'):
+            return resize_pil_prop(image, width, height, process_gif=False)
+    return image.copy()
+
+
 def pil_image(
     width: Optional[int] = None,
     height: Optional[int] = None,
@@ -389,36 +846,94 @@ def pil_image(
     to_file: bool = True,
     pass_buf: bool = False,
     max_frames: int = MAX_FRAMES,
+    process: bool = True,
+    parallel_frames: bool = True,
+    cache: bool = True,
+    output_format: Optional[str] = None,
 ) -> Callable[[PillowFunction], PillowThreaded]:
     def decorator(func: PillowFunction) -> PillowThreaded:
 
-        async def wrapper(ctx: BombContext, img: Image.Image, *args: P.args, **kwargs: P.kwargs) -> R:
-            img = await ImageConverter().get_image(ctx, img)
+        def inner(
+            ctx: Optional[BombContext],
+            image: BytesIO,
+            args: tuple[Any, ...],
+            kwargs: dict[str, Any],
+            options: Optional[OutputOptions] = None,
+        ) -> R:
+            durations = None
+            if not pass_buf:
+                image: Image.Image = open_pil_image(image, width, height)
+                durations = image.info.get('duration')
+
+                if isinstance(func, FrameGenerator) and auto_save:
+                    sink = get_animation_sink(options)(mirror=func.mirror)
+
+                    with _generator_source(image, width, height) as source, sink:
+                        func.generate(ctx, source, sink, args, kwargs)
+                        return sink.save(file=to_file, options=options)
+
+                if process_all_frames and auto_save and _is_pil_gif(image):
+                    check_frame_amount(image, max_frames)
+                    size = _target_size(image, width, height)
 
-            def inner(image: BytesIO) -> R:
-                durations = None
-                if not pass_buf:
-                    image: Image.Image = Image.open(image)
-                    durations = image.info.get('duration')
+                    with get_animation_sink(options)(duration=duration) as sink:
+                        run_frame_pipeline(iter_pil_frames(image, size), func, sink, ctx, *args, **kwargs)
+                        return sink.save(file=to_file, options=options)
 
-                    if width or height:
+                if width or height:
+                    with span('resize'):
                         image = resize_pil_prop(image, width, height, process_gif=process_all_frames)
 
-                if process_all_frames and (
-                    isinstance(image, list) or
-                    getattr(image, 'is_animated', False) or
-                    str(image.format).lower() == 'gif'
-                ):
+            with span('effect'):
+                if process_all_frames and (isinstance(image, list) or _is_pil_gif(image)):
                     check_frame_amount(image, max_frames)
-                    result = ImageSequence.all_frames(image, lambda frame: func(ctx, frame, *args, **kwargs))
+                    result = process_pil_gif(image, func, ctx, *args, **kwargs)
                 else:
                     result = func(ctx, image, *args, **kwargs)
 
-                if auto_save and isinstance(result, (Image.Image, list, ImageSequence.Iterator)):
-                    result = save_pil_image(result, duration=durations or duration, file=to_file)
-                return result
+            if auto_save and isinstance(result, (Image.Image, list, ImageSequence.Iterator)):
+                result = save_pil_image(result, duration=durations or duration, file=to_file, options=options)
+            return result
+
+        def render_frames(
+            ctx: Optional[BombContext],
+            image: BytesIO,
+            args: tuple[Any, ...],
+            kwargs: dict[str, Any],
+            chunk: FrameChunk,
+        ) -> PackedFrames:
+            image: Image.Image = open_pil_image(image, width, height)
+
+            with ArraySink(duration=duration) as sink:
+                if isinstance(func, FrameGenerator):
+                    with _generator_source(image, width, height) as source:
+                        func.generate(ctx, source, sink, args, kwargs, chunk=chunk)
+                else:
+                    size = _target_size(image, width, height)
+                    run_frame_pipeline(iter_pil_frames(image, size, chunk=chunk), func, sink, ctx, *args, **kwargs)
+                return sink.share()
+
+        key = register_job(func, inner)
+        frames_key = register_job(func, render_frames, name='frames')
 
-            return await run_threaded(inner, img)
+        async def wrapper(ctx: BombContext, img: Image.Image, *args: P.args, **kwargs: P.kwargs) -> R:
+            with span('fetch') as fetch:
+                img = await ImageConverter().get_image(ctx, img)
+                fetch.nbytes = img.getbuffer().nbytes
+            header = await probe_source(img, max_frames=max_frames if process_all_frames else None)
+
+            return await run_image_job(
+                ctx, key, inner, img, args, kwargs,
+                options=resolve_output(ctx, format=output_format),
+                split=_frame_split(
+                    frames_key, func, header,
+                    to_file=to_file,
+                    parallel=parallel_frames and process_all_frames,
+                ) if auto_save else None,
+                size=_job_size(func, header, width=width, height=height, all_frames=process_all_frames),
+                process=process and not pass_buf,
+                cache=cache,
+            )
         return wrapper
     return decorator
 
@@ -433,37 +948,103 @@ def wand_image(
     to_file: bool = True,
     pass_buf: bool = False,
     max_frames: int = MAX_FRAMES,
+    process: bool = True,
+    parallel_frames: bool = True,
+    cache: bool = True,
+    output_format: Optional[str] = None,
 ) -> Callable[[WandFunction], WandThreaded]:
     def decorator(func: WandFunction) -> WandThreaded:
 
-        async def wrapper(ctx: BombContext, img: Image.Image, *args: P.args, **kwargs: P.kwargs) -> R_:
-            img = await ImageConverter().get_image(ctx, img)
+        def inner(
+            ctx: Optional[BombContext],
+            image: BytesIO,
+            args: tuple[Any, ...],
+            kwargs: dict[str, Any],
+            options: Optional[OutputOptions] = None,
+        ) -> R_:
+            durations = None
+            if not pass_buf:
+                image: WandImage = open_wand_image(image, width, height)
+                image.background_color = 'none'
+
+                if isinstance(func, FrameGenerator) and auto_save:
+                    sink = WandGifSink if options is None or options.format == 'gif' else get_animation_sink(options)
+
+                    with _generator_source(image, width, height) as source, sink(mirror=func.mirror) as encoder:
+                        func.generate(ctx, source, encoder, args, kwargs)
+                        return encoder.save(file=to_file, options=options)
+
+                if process_all_frames and auto_save and _is_wand_gif(image):
+                    check_frame_amount(image, max_frames)
+                    size = _target_size(image, width, height)
+                    frames = iter_wand_frames(image, size, background='none')
+                    # ImageMagick stays the GIF encoder of wand frames
+                    sink = WandGifSink if options is None or options.format == 'gif' else get_animation_sink(options)
 
-            def inner(image: BytesIO) -> R_:
-                durations = None
-                if not pass_buf:
-                    image: WandImage = WandImage(file=image)
-                    image.background_color = 'none'
+                    with image, sink() as encoder:
+                        run_frame_pipeline(frames, func, encoder, ctx, *args, **kwargs)
+                        return encoder.save(file=to_file, options=options)
 
-                    durations = [frame.delay for frame in Sequence(image)]
+                durations = [frame.delay for frame in Sequence(image)]
 
-                    if width or height:
+                if width or height:
+                    with span('resize'):
                         image = resize_wand_prop(image, width, height)
 
-                if process_all_frames and (
-                    isinstance(image, list) or
-                    len(image.sequence) > 1 or
-                    str(image.format).lower() == 'gif'
-                ):
+            with span('effect'):
+                if process_all_frames and (isinstance(image, list) or _is_wand_gif(image)):
                     result = process_wand_gif(image, func, ctx, *args, max_frames=max_frames, **kwargs)
                 else:
                     result = func(ctx, image, *args, **kwargs)
 
-                if auto_save and isinstance(result, (WandImage, list)):
-                    result = save_wand_image(result, duration=durations or duration, file=to_file)
-                return result
+            if auto_save and isinstance(result, (WandImage, list)):
+                result = save_wand_image(result, duration=durations or duration, file=to_file, options=options)
+            return result
+
+        def render_frames(
+            ctx: Optional[BombContext],
+            image: BytesIO,
+            args: tuple[Any, ...],
+            kwargs: dict[str, Any],
+            chunk: FrameChunk,
+        ) -> PackedFrames:
+            image: WandImage = open_wand_image(image, width, height)
+            image.background_color = 'none'
+
+            with ArraySink() as sink:
+                if isinstance(func, FrameGenerator):
+                    with _generator_source(image, width, height) as source:
+                        func.generate(ctx, source, sink, args, kwargs, chunk=chunk)
+                else:
+                    size = _target_size(image, width, height)
+                    with image:
+                        run_frame_pipeline(
+                            iter_wand_frames(image, size, background='none', chunk=chunk),
+                            func, sink, ctx, *args, **kwargs,
+                        )
+                return sink.share()
+
+        key = register_job(func, inner)
+        frames_key = register_job(func, render_frames, name='frames')
 
-            return await run_threaded(inner, img)
+        async def wrapper(ctx: BombContext, img: Image.Image, *args: P.args, **kwargs: P.kwargs) -> R_:
+            with span('fetch') as fetch:
+                img = await ImageConverter().get_image(ctx, img)
+                fetch.nbytes = img.getbuffer().nbytes
+            header = await probe_source(img, max_frames=max_frames if process_all_frames else None)
+
+            return await run_image_job(
+                ctx, key, inner, img, args, kwargs,
+                options=resolve_output(ctx, format=output_format),
+                split=_frame_split(
+                    frames_key, func, header,
+                    to_file=to_file,
+                    parallel=parallel_frames and process_all_frames,
+                ) if auto_save else None,
+                size=_job_size(func, header, width=width, height=height, all_frames=process_all_frames),
+                process=process and not pass_buf,
+                cache=cache,
+            )
         return wrapper
     return decorator
 
@@ -503,6 +1084,7 @@ def _convert_from_arr(
 def to_array(img_mode: str = 'RGB', arr_mode: int = cv2.COLOR_RGB2BGR) -> Callable[[WandFunction | PillowFunction], WandFunction | PillowFunction]:
 
     def decorator(func: WandFunction | PillowFunction) -> WandFunction | PillowFunction:
+        @functools.wraps(func)
         def inner(ctx: BombContext, image: Image.Image | WandImage | list[Image.Image | WandImage], *args: P.args, **kwargs: P.kwargs) -> R | R_:
 
             if isinstance(image, list):
@@ -534,12 +1116,13 @@ async def _do_command_body(
     end = time.perf_counter()
     elapsed = (end - start) * 1000
 
-    await ctx.reply(
-        content=f'**Process Time:** `{elapsed:.2f} ms`',
-        file=file,
-        mention_author=False,
-        delete_button=True,
-    )
+    with span('upload', nbytes=file.fp.getbuffer().nbytes if isinstance(file, discord.File) else 0):
+        await ctx.reply(
+            content=f'**Process Time:** `{elapsed:.2f} ms`',
+            file=file,
+            mention_author=False,
+            delete_button=True,
+        )
 
 async def do_command(
     ctx: BombContext,
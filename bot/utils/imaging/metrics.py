@@ -0,0 +1,200 @@
+"""
+Stage timings of imaging jobs, exposed in the prometheus text format
+
+A job is broken into the `STAGES` below, recorded through `span` (or `record`).
+Inside a job, a stage may be entered once per frame, so its spans are summed up by `collect_stages`
+and observed once the job is done, worker processes send them back along with the job's result
+"""
+from __future__ import annotations
+
+from typing import (
+    Final,
+    Iterator,
+    TypeAlias,
+)
+from bisect import bisect_left
+from math import inf
+import contextlib
+import threading
+import time
+
+from aiohttp import web
+
+__all__: tuple[str, ...] = (
+    'STAGES',
+    'StageStats',
+    'MetricsRegistry',
+    'REGISTRY',
+    'StageTimings',
+    'Span',
+    'span',
+    'record',
+    'collect_stages',
+    'start_metrics_server',
+)
+
+STAGES: Final[tuple[str, ...]] = ('fetch', 'schedule', 'queue', 'decode', 'resize', 'effect', 'encode', 'upload')
+# upper bounds in seconds
+BUCKETS: Final[tuple[float, ...]] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, inf)
+PREFIX: Final[str] = 'bombbot_imaging'
+
+# `{stage: [seconds, bytes]}`
+StageTimings: TypeAlias = dict[str, list[float]]
+
+_local = threading.local()
+
+
+class StageStats:
+    """A histogram of the durations of one stage, along with the bytes it handled"""
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'bytes')
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.bytes: int = 0
+
+    def observe(self, seconds: float, nbytes: int = 0) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.bytes += nbytes
+
+    def quantile(self, q: float) -> float:
+        """Estimates the `q` quantile in seconds, interpolating linearly within its bucket"""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                # the last bucket has no upper bound
+                upper = self.buckets[i] if self.buckets[i] != inf else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-2]
+
+    def copy(self) -> StageStats:
+        stats = StageStats(self.buckets)
+        stats.counts = self.counts.copy()
+        stats.count, stats.sum, stats.bytes = self.count, self.sum, self.bytes
+        return stats
+
+
+class MetricsRegistry:
+    """Thread-safe stage histograms of the jobs run by this process"""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self._stages: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            if (stats := self._stages.get(stage)) is None:
+                stats = self._stages[stage] = StageStats(self.buckets)
+            stats.observe(seconds, nbytes)
+
+    def observe_stages(self, stages: StageTimings) -> None:
+        """Observes the per-stage totals of one job, as collected by `collect_stages`"""
+        for stage, (seconds, nbytes) in stages.items():
+            self.observe(stage, seconds, int(nbytes))
+
+    def snapshot(self) -> dict[str, StageStats]:
+        """Copies of the stats of every stage that has been observed, in `STAGES` order"""
+        with self._lock:
+            order = {stage: i for i, stage in enumerate(STAGES)}
+            return {
+                stage: self._stages[stage].copy()
+                for stage in sorted(self._stages, key=lambda stage: order.get(stage, len(order)))
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def render(self) -> str:
+        """The stats in the prometheus text exposition format"""
+        lines = [
+            f'# HELP {PREFIX}_stage_seconds Time spent in each stage of imaging jobs',
+            f'# TYPE {PREFIX}_stage_seconds histogram',
+        ]
+        snapshot = self.snapshot()
+
+        for stage, stats in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(stats.buckets, stats.counts):
+                cumulative += count
+                le = '+Inf' if bound == inf else repr(float(bound))
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {stats.sum}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+
+        lines += [
+            f'# HELP {PREFIX}_stage_bytes_total Bytes handled by each stage of imaging jobs',
+            f'# TYPE {PREFIX}_stage_bytes_total counter',
+        ]
+        lines += [
+            f'{PREFIX}_stage_bytes_total{{stage="{stage}"}} {stats.bytes}'
+            for stage, stats in snapshot.items()
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY: Final[MetricsRegistry] = MetricsRegistry()
+
+
+def record(stage: str, seconds: float, nbytes: int = 0) -> None:
+    """Adds to the job being collected on this thread, or observes straight away outside of jobs"""
+    if (stages := getattr(_local, 'stages', None)) is not None:
+        totals = stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += nbytes
+    else:
+        REGISTRY.observe(stage, seconds, nbytes)
+
+
+class Span:
+    """A running stage, `nbytes` can be set before it ends for sizes that are only known then"""
+    __slots__ = ('stage', 'nbytes', 'start')
+
+    def __init__(self, stage: str, nbytes: int = 0) -> None:
+        self.stage = stage
+        self.nbytes = nbytes
+        self.start = time.perf_counter()
+
+@contextlib.contextmanager
+def span(stage: str, *, nbytes: int = 0) -> Iterator[Span]:
+    current = Span(stage, nbytes)
+    try:
+        yield current
+    finally:
+        record(stage, time.perf_counter() - current.start, current.nbytes)
+
+@contextlib.contextmanager
+def collect_stages() -> Iterator[StageTimings]:
+    """Sums up the stages recorded on this thread into the yielded `{stage: [seconds, bytes]}`"""
+    previous = getattr(_local, 'stages', None)
+    _local.stages = stages = {}
+    try:
+        yield stages
+    finally:
+        _local.stages = previous
+
+
+async def start_metrics_server(host: str = '127.0.0.1', port: int = 9108) -> web.AppRunner:
+    """Serves `REGISTRY` at `http://{host}:{port}/metrics`, the returned runner has to be cleaned up"""
+    async def metrics(_: web.Request) -> web.Response:
+        return web.Response(text=REGISTRY.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
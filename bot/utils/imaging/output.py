@@ -0,0 +1,158 @@
+"""
+Output settings of imaging jobs: which format animations are encoded as and how large an upload may be
+"""
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Final,
+    Optional,
+    NamedTuple,
+)
+import pathlib
+import logging
+import json
+import os
+
+if TYPE_CHECKING:
+    from ..context import BombContext
+
+__all__: tuple[str, ...] = (
+    'ANIMATED_FORMATS',
+    'OutputOptions',
+    'configure_output',
+    'set_guild_format',
+    'resolve_output',
+)
+
+ANIMATED_FORMATS: Final[tuple[str, ...]] = ('gif', 'webp', 'apng')
+# discord's upload limit outside of (boosted) guilds
+DEFAULT_MAX_BYTES: Final[int] = 8 * 1024 * 1024
+
+_log = logging.getLogger(__name__)
+
+
+class OutputOptions(NamedTuple):
+    """How a job's result gets saved, picklable so that it can be sent to worker processes
+
+    Attributes
+    ----------
+    format : str
+        the format animations are encoded as, one of `ANIMATED_FORMATS`
+    max_bytes : Optional[int]
+        the upload limit the output has to fit in
+    fallback : tuple[str, ...]
+        formats tried in order when an animation comes out larger than `max_bytes`
+    """
+    format: str = 'gif'
+    max_bytes: Optional[int] = None
+    fallback: tuple[str, ...] = ('webp',)
+
+
+_DEFAULT_FORMAT: str = 'gif'
+_FALLBACK: tuple[str, ...] = ('webp',)
+_GUILD_FORMATS: dict[int, str] = {}
+# where the formats set through `set_guild_format` are kept, `None` keeps them in memory only
+_GUILD_FORMATS_PATH: Optional[pathlib.Path] = None
+# `{guild id: format}` set through `set_guild_format`, `None` marks a guild reset to the default
+_GUILD_OVERRIDES: dict[int, Optional[str]] = {}
+
+def _check_format(format: str) -> str:
+    if format not in ANIMATED_FORMATS:
+        raise ValueError(f'unknown animation format {format!r}, expected one of {ANIMATED_FORMATS}')
+    return format
+
+def _load_overrides(path: pathlib.Path) -> dict[int, Optional[str]]:
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        _log.warning(f'could not load guild animation formats from {path}: {exc}')
+        return {}
+
+    try:
+        return {int(guild_id): None if fmt is None else _check_format(fmt) for guild_id, fmt in overrides.items()}
+    except (AttributeError, ValueError) as exc:
+        _log.warning(f'could not load guild animation formats from {path}: {exc}')
+        return {}
+
+def _save_overrides(path: pathlib.Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_suffix('.tmp')
+    with open(temp, 'w') as f:
+        json.dump({str(guild_id): fmt for guild_id, fmt in _GUILD_OVERRIDES.items()}, f, indent=4, sort_keys=True)
+    os.replace(temp, path)
+
+def _apply_override(guild_id: int, format: Optional[str]) -> None:
+    if format is None:
+        _GUILD_FORMATS.pop(guild_id, None)
+    else:
+        _GUILD_FORMATS[guild_id] = format
+
+def configure_output(
+    *,
+    format: str = 'gif',
+    guilds: Optional[dict[str | int, str]] = None,
+    fallback: tuple[str, ...] | list[str] = ('webp',),
+    path: Optional[str | os.PathLike] = None,
+) -> None:
+    """Sets the default animation format, per-guild overrides and the size fallbacks
+
+    The formats guilds set through `set_guild_format` are saved to the JSON file `path` so that they survive restarts,
+    they take precedence over `guilds`
+    """
+    global _DEFAULT_FORMAT, _FALLBACK, _GUILD_FORMATS_PATH
+
+    _DEFAULT_FORMAT = _check_format(format)
+    _FALLBACK = tuple(_check_format(fmt) for fmt in fallback)
+
+    _GUILD_FORMATS.clear()
+    for guild_id, fmt in (guilds or {}).items():
+        _GUILD_FORMATS[int(guild_id)] = _check_format(fmt)
+
+    _GUILD_FORMATS_PATH = pathlib.Path(path) if path else None
+    if _GUILD_FORMATS_PATH is not None:
+        _GUILD_OVERRIDES.clear()
+        _GUILD_OVERRIDES.update(_load_overrides(_GUILD_FORMATS_PATH))
+
+    for guild_id, fmt in _GUILD_OVERRIDES.items():
+        _apply_override(guild_id, fmt)
+
+def set_guild_format(guild_id: int, format: Optional[str]) -> bool:
+    """Overrides the animation format of a guild, `None` resets it to the default
+
+    Returns whether the override was saved, it only lasts until a restart if no path is configured
+    """
+    if format is not None:
+        _check_format(format)
+
+    _GUILD_OVERRIDES[guild_id] = format
+    _apply_override(guild_id, format)
+
+    if _GUILD_FORMATS_PATH is None:
+        return False
+
+    try:
+        _save_overrides(_GUILD_FORMATS_PATH)
+    except OSError as exc:
+        _log.warning(f'could not save guild animation formats to {_GUILD_FORMATS_PATH}: {exc}')
+        return False
+    return True
+
+def resolve_output(ctx: Optional[BombContext], *, format: Optional[str] = None) -> OutputOptions:
+    """The output options of a job invoked through `ctx`
+
+    The guild's format takes precedence over the command's `format`, which takes precedence over the default
+    """
+    guild = getattr(ctx, 'guild', None)
+
+    if guild is not None and guild.id in _GUILD_FORMATS:
+        format = _GUILD_FORMATS[guild.id]
+
+    return OutputOptions(
+        format=format or _DEFAULT_FORMAT,
+        max_bytes=guild.filesize_limit if guild is not None else DEFAULT_MAX_BYTES,
+        fallback=_FALLBACK,
+    )
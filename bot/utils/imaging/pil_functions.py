@@ -2,10 +2,10 @@ from __future__ import annotations
 from io import BytesIO
 from math import ceil
 
-from typing import TYPE_CHECKING, Final, Any
+from typing import TYPE_CHECKING
+from itertools import accumulate
+import functools
 import textwrap
-import pathlib
-import random
 import string
 
 import humanize
@@ -26,11 +26,12 @@ from ..helpers import (
     get_asset,
     truncate,
 )
-from .braille_data import BRAILLE_DATA
+from .blocks import load_block_data, render_blocks
 from .fonts import *
+from .shapes import ShapeStamps, make_stamps, splat_shapes
+from .generator import frame_generator
 from .image import (
     resize_pil_prop,
-    get_closest_color,
     pil_image,
     pil_circle_mask,
     pil_circular,
@@ -60,16 +61,6 @@ __all__: tuple[str, ...] = (
     'pixel',
 )
 
-MCSIZE: Final[int] = 16
-
-def _load_mc_colors() -> dict[tuple[int, int, int], Image.Image]:
-    colors = {}
-    for file in pathlib.Path(get_asset('minecraft/')).glob('*.png'):
-        block = Image.open(get_asset(file)).convert('RGB')
-        single = block.resize((1, 1))
-        colors[single.getpixel((0, 0))] = block.resize((MCSIZE, MCSIZE))
-    return colors
-
 # global image "cache"
 PAINT_MASK: Image.Image = (
     Image.open(
@@ -80,10 +71,15 @@ PAINT_MASK: Image.Image = (
 )
 PIL_CIRCLE_MASK: Image.Image = pil_circle_mask(1000, 1000)
 
-MC_COLORS = _load_mc_colors()
-MC_SAMPLE: np.ndarray = np.array(
-    list(MC_COLORS.keys())
-)
+MC_BLOCKS: dict[str, np.ndarray] = load_block_data()
+MC_ATLAS: np.ndarray = MC_BLOCKS['atlas']
+MC_SAMPLE: np.ndarray = MC_BLOCKS['colors']
+MC_LUT: np.ndarray = MC_BLOCKS['lut']
+
+LINE_STAMPS: ShapeStamps = make_stamps('line')
+BALL_STAMPS: ShapeStamps = make_stamps('ellipse', outline='black')
+SQUARE_STAMPS: ShapeStamps = make_stamps('rectangle')
+LETTER_STAMPS: ShapeStamps = make_stamps('text', texts=string.ascii_lowercase, font=CODE_FONT, anchor='mm')
 
 def _render_palette_image(colors: list[tuple[int, ...]]) -> Image.Image:
     CIRC, SPACE = 20, 5
@@ -103,52 +99,64 @@ def _render_palette_image(colors: list[tuple[int, ...]]) -> Image.Image:
         y += TOTALSP
     return base
 
-def _gen_shape_frame(
-    img: Image.Image,
-    method: str,
-    *,
-    size: int = 10,
-    count: int = 10000,
-    **options: Any,
-) -> Image.Image:
+@functools.lru_cache(maxsize=4)
+def _matrix_glyph_atlas(size: int) -> np.ndarray:
+    """Rasterises every `string.printable` character once
 
-    text_arg = options.get('text')
-    base = Image.new('RGBA', img.size, 0)
-    cursor = ImageDraw.Draw(base)
-
-    for _ in range(count):
-        if text_arg:
-            options['text'] = text_arg()
-        x = random.randrange(1, img.width)
-        y = random.randrange(1, img.height)
-
-        _method = getattr(cursor, method, lambda *_: _)
-        _method(
-            xy=(x - size, y - size, x + size, y + size),
-            fill=img.getpixel((x, y)),
-            **options,
-        )
-    return base
-
-def _generate_matrix_frame(img: Image.Image, *, size: int = 30) -> Image.Image:
+    Returns
+    -------
+    np.ndarray
+        a `(len(string.printable), height, size)` array of glyph coverage masks,
+        `height` can exceed `size` as descenders spill over into the cell below
+    """
     if CODE_FONT.size != size:
         font = CODE_FONT.font_variant(size=size)
     else:
         font = CODE_FONT
 
-    base = Image.new('RGB', (img.width * size, img.height * size), 0)
-    cursor = ImageDraw.Draw(base)
-    x, y = 0, 0
-    for row in np.asarray(img.convert('RGBA')):
-        for px in row:
-            if px[-1] != 0:
-                cursor.text((x, y), random.choice(string.printable), font=font, fill=tuple(px[:-1]))
-            x += size
-        x = 0
-        y += size
-    return base
+    height = max(size, max(font.getbbox(char)[3] for char in string.printable))
+    glyphs = []
+    for char in string.printable:
+        with Image.new('L', (size, height), 0) as glyph:
+            ImageDraw.Draw(glyph).text((0, 0), char, font=font, fill=255)
+            glyphs.append(np.asarray(glyph))
+    return np.stack(glyphs)
+
+def _div255(arr: np.ndarray) -> np.ndarray:
+    """`round(arr / 255)` for uint16 arrays up to `255 * 255`, without a division"""
+    arr = arr + 128
+    arr += arr >> 8
+    arr >>= 8
+    return arr
 
-@pil_image(process_all_frames=False)
+def _generate_matrix_frame(img: Image.Image, *, size: int = 30) -> Image.Image:
+    glyphs = _matrix_glyph_atlas(size)
+    _, glyph_h, _ = glyphs.shape
+    spill = glyph_h - size
+
+    pixels = np.asarray(img.convert('RGBA'))
+    h, w, _ = pixels.shape
+    chars = np.random.randint(len(glyphs), size=(h, w))
+
+    # the coverage of every cell's glyph, laid out as `(row, glyph row, column, glyph column)`
+    # so that the cells of a channel reshape into its plane, transparent pixels get none
+    alpha = glyphs[chars] * (pixels[..., 3] != 0)[..., None, None]
+    alpha = alpha.transpose(0, 2, 1, 3).astype(np.uint16)
+    # one plane per channel, numpy broadcasts over leading axes far faster than over a trailing one
+    ink = pixels[..., :3].transpose(2, 0, 1).astype(np.uint16)[:, :, None, :, None] * alpha
+
+    cells = _div255(ink[:, :, :size])
+    if spill:
+        # the descenders of the row above spill into the top of each cell, the first row has none above it
+        above = np.pad(_div255(ink[:, :-1, size:]), ((0, 0), (1, 0), (0, 0), (0, 0), (0, 0)))
+        above *= 255 - alpha[:, :spill]
+        above += ink[:, :, :spill]
+        cells[:, :, :spill] = _div255(above)
+
+    planes = cells.astype(np.uint8).reshape(3, h * size, w * size)
+    return Image.merge('RGB', [Image.fromarray(plane, 'L') for plane in planes])
+
+@pil_image(process_all_frames=False, cache=False)
 def matrix(_, img: Image.Image, *, size: int = 70) -> list[Image.Image]:
     img = resize_pil_prop(img, height=size, process_gif=False)
     return [_generate_matrix_frame(img) for _ in range(4)]
@@ -165,34 +173,24 @@ def mirror(_, img: Image.Image) -> Image.Image:
 def contour(_, img: Image.Image) -> Image.Image:
     return img.filter(ImageFilter.CONTOUR)
 
-@pil_image(width=400, process_all_frames=False)
-def spin(_, img: Image.Image) -> list[Image.Image]:
+def _circular_source(_, img: Image.Image, *, circular: bool = True) -> Image.Image:
     img = img.convert('RGBA')
-    img = pil_circular(img, mask=PIL_CIRCLE_MASK)
 
-    frames = []
-    for i in range(0, 360, 8):
-        img = img.rotate(i, resample=Image.BICUBIC)
-        frames.append(img)
+    if circular:
+        img = pil_circular(img, mask=PIL_CIRCLE_MASK)
+    return img
 
-    frames += reversed(frames)
-    return frames
+@pil_image(width=400, process_all_frames=False)
+# each frame turns 8 degrees further than the last one did
+@frame_generator(tuple(accumulate(range(0, 360, 8))), mirror=True, prepare=_circular_source)
+def spin(_, img: Image.Image, angle: int) -> Image.Image:
+    return img.rotate(angle, resample=Image.BICUBIC)
 
 @pil_image()
 def minecraft(_, img: Image.Image, size: int = 70) -> Image.Image:
     img = resize_pil_prop(img, height=size, resampling=Image.BILINEAR, process_gif=False)
-    bg = Image.new('RGBA', (img.width * MCSIZE, img.height * MCSIZE), 0)
-    x, y = 0, 0
-    for row in np.asarray(img.convert('RGBA')):
-        for px in row:
-            if px[-1] != 0:
-                color = get_closest_color(px[:-1], MC_SAMPLE)
-                file = MC_COLORS[color]
-                bg.paste(file, (x, y))
-            x += MCSIZE
-        x = 0
-        y += MCSIZE
-    return bg
+    mosaic = render_blocks(np.asarray(img.convert('RGBA')), MC_ATLAS, MC_LUT)
+    return Image.fromarray(mosaic, 'RGBA')
 
 @to_thread
 def type_gif(_, text: str, *, duration: int = 500) -> discord.File:
@@ -209,70 +207,71 @@ def type_gif(_, text: str, *, duration: int = 500) -> discord.File:
 
     return save_pil_image(frames, duration=duration)
 
-@pil_image(width=300, process_all_frames=False)
+@pil_image(width=300, process_all_frames=False, cache=False)
 def lines(_, img: Image.Image) -> list[Image.Image]:
-    img = img.convert('RGBA')
-    return [_gen_shape_frame(img, 'line') for _ in range(3)]
+    return [splat_shapes(img, LINE_STAMPS) for _ in range(3)]
 
-@pil_image(width=300, process_all_frames=False)
+@pil_image(width=300, process_all_frames=False, cache=False)
 def balls(_, img: Image.Image) -> list[Image.Image]:
-    img = img.convert('RGBA')
-    return [_gen_shape_frame(img, 'ellipse', outline='black') for _ in range(3)]
+    return [splat_shapes(img, BALL_STAMPS) for _ in range(3)]
 
-@pil_image(width=300, process_all_frames=False)
+@pil_image(width=300, process_all_frames=False, cache=False)
 def squares(_, img: Image.Image) -> list[Image.Image]:
-    img = img.convert('RGBA')
-    return [_gen_shape_frame(img, 'rectangle') for _ in range(3)]
+    return [splat_shapes(img, SQUARE_STAMPS) for _ in range(3)]
 
-@pil_image(width=300, process_all_frames=False)
+@pil_image(width=300, process_all_frames=False, cache=False)
 def letters(_, img: Image.Image) -> list[Image.Image]:
-    img = img.convert('RGBA')
-    return [
-        _gen_shape_frame(
-            img=img,
-            method='text',
-            text=lambda: random.choice(string.ascii_lowercase),
-            count=3000,
-            font=CODE_FONT,
-            anchor='mm',
-        ) for _ in range(3)
-    ]
-
-def _get_braille_from_px(
-    x: int, y: int,
-    image: Image.Image,
+    return [splat_shapes(img, LETTER_STAMPS, count=3000) for _ in range(3)]
+
+# bit of each dot within a 2x4 braille cell, see https://en.wikipedia.org/wiki/Braille_Patterns
+BRAILLE_DOTS: np.ndarray = np.array([
+    [0x01, 0x08],
+    [0x02, 0x10],
+    [0x04, 0x20],
+    [0x40, 0x80],
+], dtype=np.uint8)
+BRAILLE_BASE: int = 0x2800
+# an empty cell is drawn as a single dot, as the blank pattern has no width in the braille font
+BRAILLE_BLANK: int = 0x2880
+
+def _get_braille_masks(
+    img: Image.Image,
     *,
+    threshold: int,
     invert: bool = False,
-    threshold: int
-) -> str:
-    region = [['0', '0']] * 4
-    w, h = image.size
-
-    for i in range(x, x + 2):
-        for j in range(y, y + 2):
-            gray = 0 if i >= w or j >= h else (
-                sum(px := image.getpixel((i, j))) / len(px)
-            )
-            region[j - y][i - x] = ('1', '0')[invert] if gray < threshold else ('0', '1')[invert]
-    return BRAILLE_DATA.get(
-        ' '.join(''.join(r) for r in region), '.'
-    )
-
-def _fix_braille_spaces(
-    arr: list[list[str]], width: int, height: int
-) -> list[list[str]]:
-    for (y, row) in enumerate(arr[:height]):
-        last = width - 1
-        for x in reversed(range(width)):
-            if row[x] != '.':
-                break
-            last = x
-        arr[y] = row[:last]
-    for row in arr[:height]:
-        for (x, item) in enumerate(row):
-            if item == '.':
-                row[x] = '⢀'
-    return arr
+) -> np.ndarray:
+    """Packs every 2x4 cell of `img` into its 8-bit braille dot mask,
+    a dot is raised where the mean of the RGBA channels is below `threshold` (or above it if `invert`)
+
+    Returns
+    -------
+    np.ndarray
+        a `(ceil(h / 4), ceil(w / 2))` uint8 array, pixels past the edge count as black
+    """
+    gray = np.asarray(img.convert('RGBA'), dtype=np.uint16).sum(axis=2) / 4
+    h, w = gray.shape
+    height, width = ceil(h / 4), ceil(w / 2)
+
+    gray = np.pad(gray, ((0, height * 4 - h), (0, width * 2 - w)))
+    dots = (gray < threshold) ^ invert
+
+    cells = dots.reshape(height, 4, width, 2).astype(np.uint8)
+    return np.einsum('yjxi,ji->yx', cells, BRAILLE_DOTS, dtype=np.uint8)
+
+def _braille_text(masks: np.ndarray) -> str:
+    """Joins the dot masks into lines of braille characters,
+    trailing empty cells are dropped and inner ones replaced by `BRAILLE_BLANK`
+    """
+    height, width = masks.shape
+
+    codes = np.where(masks, BRAILLE_BASE + masks.astype(np.uint32), BRAILLE_BLANK).astype('<u4')
+    filled = masks != 0
+    # index one past the last non-empty cell of each row
+    ends = np.where(filled.any(axis=1), width - filled[:, ::-1].argmax(axis=1), 0)
+    codes[np.arange(width) >= ends[:, None]] = 0
+
+    # numpy strips the trailing NULs of each line when viewing the codepoints as fixed-width strings
+    return '\n'.join(codes.view(f'<U{width}').ravel())
 
 @pil_image()
 def braille(_,
@@ -283,20 +282,8 @@ def braille(_,
     invert: bool = False
 ) -> Image.Image:
     img = resize_pil_prop(img, width=size)
-    img = img.convert('RGBA')
-
-    width = ceil(img.width / 2)
-    height = ceil(img.height / 4)
-    arr = [[' '] * width for _ in range(height)]
-
-    for x in range(width):
-        for (y, _) in enumerate(arr[:height]):
-            arr[y][x] = _get_braille_from_px(
-                x * 2, y * 4, img,
-                invert=invert, threshold=threshold,
-            )
-    arr = _fix_braille_spaces(arr, width, height)
-    text = '\n'.join(''.join(row) for row in arr)
+    masks = _get_braille_masks(img, threshold=threshold, invert=invert)
+    text = _braille_text(masks)
 
     canvas = Image.new('RGB', BRAILLE_FONT.getsize_multiline(text), (255, 255, 255))
     draw = ImageDraw.Draw(canvas)
@@ -304,7 +291,7 @@ def braille(_,
     draw.text((0, 0), text, fill=0, font=BRAILLE_FONT)
     return canvas
 
-@pil_image(process_all_frames=False)
+@pil_image(process_all_frames=False, cache=False)
 def glitch(_, img: Image.Image, *, scanlines: bool = False, factor: int = 3) -> Image.Image:
     glitcher = ImageGlitcher()
     glitch_img = glitcher.glitch_image(
@@ -314,16 +301,15 @@ def glitch(_, img: Image.Image, *, scanlines: bool = False, factor: int = 3) ->
     return glitch_img
 
 @pil_image(process_all_frames=False)
-def pixel(_, img: Image.Image) -> list[Image.Image]:
-    frames = [
-        resize_pil_prop(
-            resize_pil_prop(img, width=size),
-            width=512,
-            resampling=Image.NEAREST
-        ) for size in range(50, 5, -3)
-    ]
-    frames += reversed(frames)
-    return frames
+@frame_generator(range(50, 5, -3), mirror=True)
+def pixel(_, img: Image.Image, size: int) -> Image.Image:
+    # the height is taken from the source so that rounding cannot change it between frames
+    return resize_pil_prop(
+        resize_pil_prop(img, width=size),
+        width=512,
+        height=ceil(512 * img.height / img.width),
+        resampling=Image.NEAREST
+    )
 
 @pil_image(process_all_frames=False, auto_save=False, pass_buf=True)
 def image_info(ctx: BombContext, source: BytesIO) -> tuple[discord.Embed, discord.File, discord.File] | tuple[discord.Embed, discord.File]:
@@ -417,17 +403,10 @@ def caption(_, img: Image.Image, *, text: str) -> Image.Image:
     canvas.paste(img, (0, extra_h))
     return canvas
 
-@pil_image(width=300, duration=60, process_all_frames=False)
-def bounce(_, img: Image.Image, *, circular: bool = True) -> list[Image.Image]:
-    img = img.convert('RGBA')
-
-    if circular:
-        img = pil_circular(img, mask=PIL_CIRCLE_MASK)
-
-    frames = []
-    for i in np.arange(-1, 1, 0.08):
-        base = Image.new('RGBA', (img.width, img.height * 2), 0)
-        translate = i ** 2
-        base.paste(img, (0, round(img.height * translate)))
-        frames.append(base)
-    return frames
\ No newline at end of file
+@pil_image(width=300, process_all_frames=False)
+@frame_generator(np.arange(-1, 1, 0.08), delay=60, prepare=_circular_source)
+def bounce(_, img: Image.Image, i: float, *, circular: bool = True) -> Image.Image:
+    base = Image.new('RGBA', (img.width, img.height * 2), 0)
+    translate = i ** 2
+    base.paste(img, (0, round(img.height * translate)))
+    return base
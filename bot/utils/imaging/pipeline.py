@@ -0,0 +1,725 @@
+"""
+Streaming frame pipeline shared by the `pil_image` and `wand_image` decorators
+
+Source frames are decoded (or copied out of the source) one at a time,
+passed through the function and handed straight to a `FrameSink`,
+so only the frame currently being processed is alive outside of the encoder
+"""
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Final,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+)
+from io import BytesIO
+from abc import ABC, abstractmethod
+
+import discord
+import numpy as np
+from PIL import Image, GifImagePlugin
+from wand.image import BaseImage, Image as WandImage
+
+from .output import OutputOptions
+from .workers import check_deadline
+from .metrics import span
+from .framebuffer import PackedFrames, pack_frames
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+    from ..context import BombContext
+
+__all__: tuple[str, ...] = (
+    'Frame',
+    'FrameChunk',
+    'iter_pil_frames',
+    'iter_wand_frames',
+    'FrameSink',
+    'WandGifSink',
+    'PilGifSink',
+    'PilWebpSink',
+    'PilApngSink',
+    'ArraySink',
+    'ANIMATION_SINKS',
+    'get_animation_sink',
+    'build_palette',
+    'transcode_animation',
+    'fit_animation',
+    'fit_image',
+    'encode_frames',
+    'run_frame_pipeline',
+)
+
+# the last palette entry is reserved for transparent pixels
+TRANSPARENT_INDEX: Final[int] = 255
+PALETTE_SAMPLE_FRAMES: Final[int] = 8
+PALETTE_SAMPLE_SIZE: Final[int] = 128
+# what browsers (and discord) display frames without a delay for
+DEFAULT_DELAY: Final[int] = 100
+
+# outputs are shrunk to this fraction of the upload limit, as the size estimates are rough
+BUDGET_MARGIN: Final[float] = 0.9
+BUDGET_ATTEMPTS: Final[int] = 3
+MIN_BUDGET_FRAMES: Final[int] = 8
+MIN_BUDGET_SCALE: Final[float] = 0.25
+
+
+class Frame(NamedTuple):
+    image: Image.Image | WandImage
+    # milliseconds, `None` if the source did not specify one
+    delay: Optional[int]
+
+
+class FrameChunk(NamedTuple):
+    """The `[start, stop)` range of source frames a worker processes"""
+    start: int
+    stop: int
+
+
+def iter_pil_frames(
+    image: Image.Image,
+    size: Optional[tuple[int, int]] = None,
+    *,
+    resampling: Image.Resampling = Image.ANTIALIAS,
+    chunk: Optional[FrameChunk] = None,
+) -> Iterator[Frame]:
+    """Lazily decodes the frames of `image` (only those in `chunk` if given), resizing them to `size` if given"""
+    n_frames = getattr(image, 'n_frames', 1)
+    start, stop = chunk or (0, n_frames)
+
+    for i in range(start, min(stop, n_frames)):
+        with span('decode'):
+            image.seek(i)
+            image.load()
+
+        if size:
+            with span('resize'):
+                frame = image.resize(size, resampling)
+        else:
+            frame = image.copy()
+        yield Frame(frame, image.info.get('duration'))
+
+def iter_wand_frames(
+    image: WandImage,
+    size: Optional[tuple[int, int]] = None,
+    *,
+    resampling: str = 'lanczos',
+    background: Optional[str] = None,
+    chunk: Optional[FrameChunk] = None,
+) -> Iterator[Frame]:
+    """Yields standalone copies of the frames of `image` (only those in `chunk` if given), resized to `size` if given
+
+    ImageMagick decodes every frame upfront, so each frame is removed from `image` once copied
+    to keep the source from being held alongside the output
+    """
+    if chunk is not None:
+        del image.sequence[chunk.stop:]
+        del image.sequence[:chunk.start]
+
+    while len(image.sequence):
+        source = image.sequence[0]
+        frame = source.clone()
+        delay = source.delay
+        del image.sequence[0]
+
+        if size:
+            with span('resize'):
+                frame.resize(*size, filter=resampling)
+        if background is not None:
+            frame.background_color = background
+        yield Frame(frame, delay * 10)
+
+
+class FrameSink(ABC):
+    """An animated image encoder, fed one frame at a time
+
+    Parameters
+    ----------
+    duration : Optional[int]
+        the delay (in milliseconds) of frames appended without one
+    mirror : bool
+        whether the animation plays the appended frames back in reverse after them (ping-pong),
+        encoders reuse what they can of the frames for the reversed half instead of being fed them twice
+    """
+    format: str = 'gif'
+    extension: str = 'gif'
+
+    def __init__(self, *, duration: Optional[int] = None, mirror: bool = False) -> None:
+        self.duration = duration
+        self.mirror = mirror
+        self.frames: int = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    @abstractmethod
+    def append(self, frame: Image.Image | WandImage, delay: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def finish(self) -> BytesIO:
+        """Writes out the animation, the sink cannot be appended to afterwards"""
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def save(self, *, file: bool = True, options: Optional[OutputOptions] = None) -> discord.File | BytesIO:
+        """Finishes the animation, re-encoding it in the fallback formats of `options` if it is too large"""
+        with span('encode') as encode:
+            output, format = fit_animation(self.finish(), self.format, options)
+            encode.nbytes = output.getbuffer().nbytes
+
+        if file:
+            return discord.File(output, f'output.{ANIMATION_SINKS[format].extension}')
+        return output
+
+
+def _skip_sub_blocks(data: bytes | memoryview, pos: int) -> int:
+    """The position after the data sub-blocks starting at `pos` and their terminator"""
+    while size := data[pos]:
+        pos += size + 1
+    return pos + 1
+
+def _split_gif(data: bytes) -> tuple[bytes, list[bytes], bytes]:
+    """Splits an encoded GIF into its header, the blocks of every frame and its trailer
+
+    A frame's blocks are the extensions written before its image (e.g. its graphic control extension),
+    its image descriptor, local color table and image data,
+    extensions before the first frame that do not belong to a frame (the looping extension and comments)
+    are moved into the header, even when written after the first frame's graphic control extension as ImageMagick does
+    """
+    view = memoryview(data)
+    # signature and logical screen descriptor
+    pos = 13
+    if view[10] & 0x80:
+        pos += 3 << ((view[10] & 0x07) + 1)
+
+    header = [data[:pos]]
+    frames = []
+    # the blocks of the frame being read
+    blocks = []
+    while (introducer := view[pos]) != 0x3B:
+        start = pos
+        if introducer == 0x21:
+            label = view[pos + 1]
+            pos = _skip_sub_blocks(view, pos + 2)
+            if not frames and label in (0xFE, 0xFF):
+                header.append(data[start:pos])
+            else:
+                blocks.append(data[start:pos])
+        elif introducer == 0x2C:
+            packed = view[pos + 9]
+            pos += 10
+            if packed & 0x80:
+                pos += 3 << ((packed & 0x07) + 1)
+            # skips the LZW minimum code size
+            pos = _skip_sub_blocks(view, pos + 1)
+            blocks.append(data[start:pos])
+            frames.append(b''.join(blocks))
+            blocks.clear()
+        else:
+            raise ValueError(f'unexpected GIF block introducer 0x{introducer:02x} at {pos}')
+
+    return b''.join(header), frames, b''.join(blocks) + data[pos:]
+
+
+class WandGifSink(FrameSink):
+    """Encodes through ImageMagick, which only writes a GIF once it has every frame,
+    so frames are converted and handed over to it as they come in
+
+    ImageMagick is only given the frames once, the reversed half of a mirrored GIF repeats their encoded blocks
+    """
+
+    def __init__(self, *, duration: Optional[int] = None, mirror: bool = False) -> None:
+        super().__init__(duration=duration, mirror=mirror)
+        self._image = WandImage()
+
+    def append(self, frame: Image.Image | WandImage, delay: Optional[int] = None) -> None:
+        converted = isinstance(frame, Image.Image)
+        if converted:
+            frame = WandImage.from_array(np.asarray(frame.convert('RGBA')))
+
+        delay = delay if delay is not None else self.duration
+        frame.dispose = 'background'
+        if delay is not None:
+            # wand delays are in centiseconds
+            frame.delay = delay // 10
+
+        self._image.sequence.append(frame)
+        self.frames += 1
+
+        if converted:
+            frame.close()
+
+    def finish(self) -> BytesIO:
+        self._image.dispose = 'background'
+        self._image.format = 'GIF'
+
+        output = BytesIO()
+        self._image.save(file=output)
+        self.close()
+
+        if self.mirror:
+            # every frame covers the whole screen and is disposed of, so frames can be repeated in any order
+            header, frames, trailer = _split_gif(output.getvalue())
+            output = BytesIO()
+            output.write(header)
+            output.writelines(frames)
+            output.writelines(reversed(frames))
+            output.write(trailer)
+
+        output.seek(0)
+        return output
+
+    def close(self) -> None:
+        self._image.close()
+
+
+def build_palette(frames: Iterable[Image.Image], *, colors: int = TRANSPARENT_INDEX) -> Image.Image:
+    """Quantizes the opaque pixels of (thumbnails of) `frames` together into one palette
+
+    Returns
+    -------
+    Image.Image
+        a `P` image holding exactly `colors` palette entries, to be passed to `Image.quantize`
+    """
+    samples = []
+    for frame in frames:
+        thumbnail = frame.convert('RGBA')
+        thumbnail.thumbnail((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE), Image.BILINEAR)
+
+        pixels = np.asarray(thumbnail)
+        samples.append(pixels[pixels[..., 3] >= 128][:, :3])
+
+    sample = np.concatenate(samples) if samples else np.empty((0, 3), dtype=np.uint8)
+    if not len(sample):
+        sample = np.zeros((1, 3), dtype=np.uint8)
+
+    quantized = Image.fromarray(sample.reshape(-1, 1, 3), 'RGB').quantize(colors)
+    entries = quantized.getpalette()[:colors * 3]
+
+    palette = Image.new('P', (1, 1))
+    palette.putpalette(entries + [0] * (colors * 3 - len(entries)))
+    return palette
+
+
+class PilGifSink(FrameSink):
+    """Encodes GIFs with pillow, writing every frame out as soon as it comes in
+
+    All frames share one global palette, built from the first `sample_frames` frames
+    (which are held back until then), pixels under half opacity become transparent
+
+    Frames of a mirrored GIF are only quantized and compressed once,
+    the reversed half repeats their encoded data
+
+    Parameters
+    ----------
+    duration : Optional[int]
+        the delay (in milliseconds) of frames appended without one
+    mirror : bool
+        whether the frames are played back in reverse after them
+    sample_frames : int
+        how many frames the palette is built from
+    dither : bool
+        whether to apply Floyd-Steinberg dithering when mapping frames to the palette
+    colors : int
+        the size of the palette, at most 255
+    """
+
+    def __init__(
+        self,
+        *,
+        duration: Optional[int] = None,
+        mirror: bool = False,
+        sample_frames: int = PALETTE_SAMPLE_FRAMES,
+        dither: bool = True,
+        colors: int = TRANSPARENT_INDEX,
+    ) -> None:
+        super().__init__(duration=duration, mirror=mirror)
+        self.sample_frames = sample_frames
+        self.colors = min(colors, TRANSPARENT_INDEX)
+        self.dither = Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+
+        self._output = BytesIO()
+        self._pending: list[tuple[Image.Image, Optional[int]]] = []
+        self._palette: Optional[Image.Image] = None
+        self._palette_bytes: list[int] = []
+        self._started: bool = False
+        # the encoded frames, kept for the reversed half of mirrored GIFs
+        self._encoded: list[bytes] = []
+
+    def append(self, frame: Image.Image | WandImage, delay: Optional[int] = None) -> None:
+        if isinstance(frame, BaseImage):
+            frame = Image.fromarray(np.asarray(frame))
+
+        frame = frame.convert('RGBA')
+        delay = delay if delay is not None else self.duration
+        self.frames += 1
+
+        if self._palette is not None:
+            self._write(frame, delay)
+            return
+
+        self._pending.append((frame, delay))
+        if len(self._pending) >= self.sample_frames:
+            self._flush()
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, []
+
+        self._palette = build_palette((frame for frame, _ in pending), colors=self.colors)
+        # padded so that the transparent entry always sits at `TRANSPARENT_INDEX`
+        entries = self._palette.getpalette()
+        self._palette_bytes = entries + [0] * (TRANSPARENT_INDEX * 3 + 3 - len(entries))
+
+        for frame, delay in pending:
+            self._write(frame, delay)
+
+    def _quantize(self, frame: Image.Image) -> Image.Image:
+        indexed = frame.convert('RGB').quantize(palette=self._palette, dither=self.dither)
+
+        transparent = np.asarray(frame)[..., 3] < 128
+        if transparent.any():
+            pixels = np.array(indexed)
+            pixels[transparent] = TRANSPARENT_INDEX
+            indexed = Image.fromarray(pixels, 'P')
+
+        indexed.putpalette(self._palette_bytes)
+        return indexed
+
+    def _write(self, frame: Image.Image, delay: Optional[int]) -> None:
+        check_deadline()
+        indexed = self._quantize(frame)
+
+        if not self._started:
+            # the logical screen takes the size of the first frame
+            header, _ = GifImagePlugin.getheader(indexed, info={'loop': 0})
+            self._output.write(b''.join(header))
+            self._started = True
+
+        params: dict[str, Any] = {'disposal': 2, 'transparency': TRANSPARENT_INDEX}
+        if delay:
+            params['duration'] = delay
+
+        data = b''.join(GifImagePlugin.getdata(indexed, **params))
+        self._output.write(data)
+
+        if self.mirror:
+            self._encoded.append(data)
+
+    def finish(self) -> BytesIO:
+        if self._pending:
+            self._flush()
+        if not self._started:
+            raise ValueError('cannot encode an animation without any frames')
+
+        output = self._output
+        for data in reversed(self._encoded):
+            output.write(data)
+        self._encoded.clear()
+
+        output.write(b';')
+        output.seek(0)
+        return output
+
+
+class _BufferedSink(FrameSink):
+    """Base of the encoders pillow can only write with every frame at hand
+
+    The reversed half of mirrored animations is encoded again,
+    as these encoders store frames as the difference to the frame before them
+    """
+    save_format: str
+
+    def __init__(self, *, duration: Optional[int] = None, mirror: bool = False) -> None:
+        super().__init__(duration=duration, mirror=mirror)
+        self._frames: list[Image.Image] = []
+        self._delays: list[int] = []
+
+    def append(self, frame: Image.Image | WandImage, delay: Optional[int] = None) -> None:
+        check_deadline()
+        if isinstance(frame, BaseImage):
+            frame = Image.fromarray(np.asarray(frame))
+
+        delay = delay if delay is not None else self.duration
+        self._frames.append(frame.convert('RGBA'))
+        self._delays.append(delay or DEFAULT_DELAY)
+        self.frames += 1
+
+    def _save_options(self) -> dict[str, Any]:
+        return {}
+
+    def finish(self) -> BytesIO:
+        if not self._frames:
+            raise ValueError('cannot encode an animation without any frames')
+
+        frames, delays = self._frames, self._delays
+        if self.mirror:
+            # pillow encodes every frame it is given, the reversed half only shares the decoded frames
+            frames = frames + frames[::-1]
+            delays = delays + delays[::-1]
+
+        first, *rest = frames
+        output = BytesIO()
+        first.save(
+            output,
+            format=self.save_format,
+            save_all=True,
+            append_images=rest,
+            duration=delays,
+            loop=0,
+            **self._save_options(),
+        )
+        output.seek(0)
+
+        self.close()
+        return output
+
+    def close(self) -> None:
+        self._frames.clear()
+        self._delays.clear()
+
+
+class PilWebpSink(_BufferedSink):
+    """Encodes lossy animated WebPs, usually a fraction of the size of the same GIF
+
+    Parameters
+    ----------
+    duration : Optional[int]
+        the delay (in milliseconds) of frames appended without one
+    quality : int
+        the libwebp quality factor, between `0` and `100`
+    """
+    format = 'webp'
+    extension = 'webp'
+    save_format = 'WEBP'
+
+    def __init__(self, *, duration: Optional[int] = None, mirror: bool = False, quality: int = 80) -> None:
+        super().__init__(duration=duration, mirror=mirror)
+        self.quality = quality
+
+    def _save_options(self) -> dict[str, Any]:
+        return {'quality': self.quality, 'method': 4}
+
+
+class PilApngSink(_BufferedSink):
+    """Encodes lossless animated PNGs"""
+    format = 'apng'
+    extension = 'png'
+    save_format = 'PNG'
+
+    def _save_options(self) -> dict[str, Any]:
+        # clear every frame to transparency like the GIFs do
+        return {'disposal': 1, 'blend': 0}
+
+
+class ArraySink(FrameSink):
+    """Collects frames as RGBA arrays instead of encoding them,
+    for frames rendered in worker processes to be sent back and encoded together
+
+    The frames are collected as they are appended, `mirror` is left for the encoder to apply,
+    `share` hands them over to another process through shared memory
+    """
+    format = 'raw'
+
+    def __init__(self, *, duration: Optional[int] = None, mirror: bool = False) -> None:
+        super().__init__(duration=duration, mirror=mirror)
+        self.arrays: list[tuple[np.ndarray, Optional[int]]] = []
+
+    def append(self, frame: Image.Image | WandImage, delay: Optional[int] = None) -> None:
+        if isinstance(frame, BaseImage):
+            frame = Image.fromarray(np.asarray(frame))
+
+        self.arrays.append((np.asarray(frame.convert('RGBA')), delay if delay is not None else self.duration))
+        self.frames += 1
+
+    def share(self) -> PackedFrames:
+        """Moves the collected frames into shared memory (if they fit), which the receiver of the handle has to unlink"""
+        shared = pack_frames(self.arrays)
+        self.arrays.clear()
+        return shared
+
+    def finish(self) -> BytesIO:
+        raise TypeError('ArraySink does not encode, use `arrays` or `share`')
+
+
+ANIMATION_SINKS: dict[str, type[FrameSink]] = {
+    'gif': PilGifSink,
+    'webp': PilWebpSink,
+    'apng': PilApngSink,
+}
+
+def get_animation_sink(options: Optional[OutputOptions] = None) -> type[FrameSink]:
+    return ANIMATION_SINKS[options.format if options else 'gif']
+
+def encode_frames(
+    arrays: Iterable[tuple[np.ndarray, Optional[int]]],
+    *,
+    duration: Optional[int] = None,
+    mirror: bool = False,
+    file: bool = True,
+    options: Optional[OutputOptions] = None,
+) -> discord.File | BytesIO:
+    """Encodes the `(RGBA array, delay)` pairs collected by `ArraySink`s,
+    frames smaller than the largest one are centered on a transparent canvas of its size
+    """
+    arrays = list(arrays)
+    height = max(array.shape[0] for array, _ in arrays)
+    width = max(array.shape[1] for array, _ in arrays)
+
+    with get_animation_sink(options)(duration=duration, mirror=mirror) as sink:
+        for array, delay in arrays:
+            h, w, _ = array.shape
+            if (h, w) != (height, width):
+                top, left = (height - h) // 2, (width - w) // 2
+                array = np.pad(array, ((top, height - h - top), (left, width - w - left), (0, 0)))
+
+            with span('encode'):
+                sink.append(Image.fromarray(array, 'RGBA'), delay)
+        return sink.save(file=file, options=options)
+
+def transcode_animation(data: BytesIO, sink: type[FrameSink], **options: Any) -> BytesIO:
+    """Re-encodes an already encoded animation with `sink`, keeping its frame delays"""
+    with Image.open(data) as image, sink(**options) as encoder:
+        for frame, delay in iter_pil_frames(image):
+            encoder.append(frame, delay)
+        return encoder.finish()
+
+def _drop_frames(frames: list[Frame]) -> list[Frame]:
+    """Halves the frame rate, every kept frame also takes over the delay of the dropped one"""
+    return [
+        Frame(frames[i].image, sum(delay or DEFAULT_DELAY for _, delay in frames[i:i + 2]))
+        for i in range(0, len(frames), 2)
+    ]
+
+def _scale_image(image: Image.Image, scale: float) -> Image.Image:
+    size = (max(round(image.width * scale), 1), max(round(image.height * scale), 1))
+    return image.convert('RGBA').resize(size, Image.ANTIALIAS)
+
+def _shrink_animation(output: BytesIO, format: str, max_bytes: int, attempt: int) -> BytesIO:
+    """Re-encodes `output` with a smaller palette (or lower quality), fewer frames and smaller dimensions,
+    each applied only while the estimated size is still over `max_bytes`
+    """
+    size = output.getbuffer().nbytes
+    budget = max_bytes * BUDGET_MARGIN
+    estimate = float(size)
+
+    output.seek(0)
+    with Image.open(output) as image:
+        frames = list(iter_pil_frames(image))
+
+    # encoder settings first, they are the cheapest on quality, the estimates are rough averages
+    options: dict[str, Any] = {}
+    if format == 'gif':
+        options['colors'] = max(TRANSPARENT_INDEX >> (attempt + 1), 32)
+        estimate *= 0.85
+    elif format == 'webp':
+        options['quality'] = max(80 - 20 * (attempt + 1), 20)
+        estimate *= 0.7
+
+    if estimate > budget and len(frames) >= MIN_BUDGET_FRAMES * 2:
+        frames = _drop_frames(frames)
+        estimate /= 2
+
+    if estimate > budget:
+        scale = max((budget / estimate) ** 0.5, MIN_BUDGET_SCALE)
+        frames = [Frame(_scale_image(frame, scale), delay) for frame, delay in frames]
+
+    with ANIMATION_SINKS[format](**options) as encoder:
+        for frame, delay in frames:
+            encoder.append(frame, delay)
+        return encoder.finish()
+
+def fit_animation(
+    output: BytesIO,
+    format: str,
+    options: Optional[OutputOptions] = None,
+) -> tuple[BytesIO, str]:
+    """Tries the fallback formats of `options` in order while `output` exceeds its upload limit,
+    keeping whichever encoding came out smallest
+
+    Returns
+    -------
+    tuple[BytesIO, str]
+        the output and its format
+    """
+    if options is None or options.max_bytes is None:
+        return output, format
+
+    for fallback in options.fallback:
+        if output.getbuffer().nbytes <= options.max_bytes:
+            break
+        if fallback == format:
+            continue
+
+        output.seek(0)
+        candidate = transcode_animation(output, ANIMATION_SINKS[fallback])
+
+        if candidate.getbuffer().nbytes < output.getbuffer().nbytes:
+            output, format = candidate, fallback
+
+    # still too large in every format, trade quality for size instead of failing the upload
+    for attempt in range(BUDGET_ATTEMPTS):
+        if output.getbuffer().nbytes <= options.max_bytes:
+            break
+        output = _shrink_animation(output, format, options.max_bytes, attempt)
+
+    output.seek(0)
+    return output, format
+
+def fit_image(output: BytesIO, options: Optional[OutputOptions] = None) -> BytesIO:
+    """Downscales a still image while it exceeds the upload limit of `options`"""
+    if options is None or options.max_bytes is None:
+        return output
+
+    for _ in range(BUDGET_ATTEMPTS):
+        size = output.getbuffer().nbytes
+        if size <= options.max_bytes:
+            break
+
+        output.seek(0)
+        with Image.open(output) as image:
+            # the encoded size of a PNG roughly scales with its pixel count
+            scale = max((options.max_bytes * BUDGET_MARGIN / size) ** 0.5, MIN_BUDGET_SCALE)
+            image = _scale_image(image, scale)
+
+            output = BytesIO()
+            image.save(output, format='PNG')
+
+    output.seek(0)
+    return output
+
+
+def run_frame_pipeline(
+    frames: Iterable[Frame],
+    func: Callable[..., Any],
+    sink: FrameSink,
+    ctx: Optional[BombContext],
+    *args: Any,
+    **kwargs: Any,
+) -> FrameSink:
+    """Applies `func` to every frame and appends the result(s) to `sink` with the frame's delay,
+    checking the job's deadline between frames
+    """
+    for image, delay in frames:
+        check_deadline()
+        with span('effect'):
+            result = func(ctx, image, *args, **kwargs)
+
+        for frame in (result if isinstance(result, list) else (result,)):
+            if not isinstance(frame, (Image.Image, BaseImage)):
+                raise TypeError(f'expected an image to be returned for every frame, got {type(frame).__name__}')
+
+            with span('encode'):
+                sink.append(frame, delay)
+    return sink
@@ -0,0 +1,108 @@
+"""
+Cheap header probing of image sources, done before any pixel data gets decoded
+"""
+from __future__ import annotations
+
+from typing import Final, Optional, NamedTuple
+from io import BytesIO
+from math import ceil
+import warnings
+
+from PIL import Image, UnidentifiedImageError
+
+from .exceptions import TooManyFrames, ImageDimensionsTooLarge
+
+__all__: tuple[str, ...] = (
+    'ImageHeader',
+    'probe_image',
+    'check_image_header',
+    'draft_size',
+)
+
+MAX_PIXELS: Final[int] = 25_000_000
+MAX_TOTAL_PIXELS: Final[int] = 100_000_000
+DRAFT_MAX_SIZE: Final[int] = 2048
+# libjpeg can decode straight to 1/8th of the size
+DRAFT_MAX_SCALE: Final[int] = 8
+
+
+class ImageHeader(NamedTuple):
+    format: Optional[str]
+    width: int
+    height: int
+    frames: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def is_jpeg(self) -> bool:
+        return self.format == 'JPEG'
+
+
+def probe_image(data: bytes) -> Optional[ImageHeader]:
+    """Reads the format, size and frame count of `data` from its headers,
+    GIF frames are counted by skipping over their blocks without decoding them
+
+    Returns `None` for anything pillow cannot identify (e.g. formats only ImageMagick reads)
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+
+            # the header limits are enforced by `check_image_header` instead
+            with Image.open(BytesIO(data)) as img:
+                return ImageHeader(
+                    img.format,
+                    *img.size,
+                    getattr(img, 'n_frames', 1),
+                )
+    except Image.DecompressionBombError as exc:
+        raise ImageDimensionsTooLarge(max_pixels=MAX_PIXELS) from exc
+    except (UnidentifiedImageError, OSError, ValueError, SyntaxError):
+        return None
+
+def check_image_header(
+    header: Optional[ImageHeader],
+    *,
+    max_frames: Optional[int] = None,
+    max_pixels: int = MAX_PIXELS,
+    max_total_pixels: int = MAX_TOTAL_PIXELS,
+) -> None:
+    """Rejects images that would be too expensive to fully decode,
+    JPEGs are allowed to be larger as they get decoded in draft mode (see `draft_size`)
+    """
+    if header is None:
+        return
+
+    if max_frames is not None and header.frames > max_frames:
+        raise TooManyFrames(header.frames, max_frames)
+
+    pixels = header.pixels
+    if header.is_jpeg:
+        pixels //= DRAFT_MAX_SCALE ** 2
+
+    if pixels > max_pixels or pixels * header.frames > max_total_pixels:
+        raise ImageDimensionsTooLarge(header.width, header.height, header.frames, max_pixels=max_pixels)
+
+def draft_size(
+    header: Optional[ImageHeader],
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> Optional[tuple[int, int]]:
+    """The size a JPEG can be decoded at in draft mode,
+    either the size the function is going to resize it to anyways or at most `DRAFT_MAX_SIZE`
+    """
+    if header is None or not header.is_jpeg:
+        return None
+
+    w, h = header.width, header.height
+    if width:
+        return width, ceil(width / w * h)
+    elif height:
+        return ceil(height / h * w), height
+    elif max(w, h) > DRAFT_MAX_SIZE:
+        scale = DRAFT_MAX_SIZE / max(w, h)
+        return ceil(w * scale), ceil(h * scale)
+    return None
@@ -0,0 +1,266 @@
+"""
+Admission control for imaging jobs
+
+Every job goes through one `JobScheduler`, which caps how many workers the running jobs occupy and their summed cost,
+and queues the rest in a bounded queue, past which new jobs are rejected.
+A job split across several workers holds a slot for each of them.
+
+Jobs the cost model predicts to be quick go through a fast lane, which has workers reserved for it
+and is dispatched first, so that they never wait behind heavy jobs.
+Within a lane, queued jobs are ordered by weighted fair queuing over guilds:
+each guild's jobs get virtual finish tags that advance by their cost,
+so a guild submitting a burst of heavy jobs does not hold back other guilds' jobs
+"""
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Optional,
+    Callable,
+    Awaitable,
+    AsyncIterator,
+)
+import contextlib
+import itertools
+import asyncio
+import heapq
+
+from .exceptions import ImagingQueueFull
+from .metrics import span
+from .workers import DEFAULT_WORKERS
+
+__all__: tuple[str, ...] = (
+    'JobScheduler',
+    'configure_scheduler',
+    'get_scheduler',
+)
+
+
+class _Ticket:
+    __slots__ = ('lane', 'guild', 'cost', 'workers', 'tag', 'order', 'future')
+
+    def __init__(
+        self,
+        lane: _Lane,
+        guild: Optional[int],
+        cost: int,
+        workers: int,
+        tag: float,
+        order: int,
+        future: asyncio.Future[None],
+    ) -> None:
+        self.lane = lane
+        self.guild = guild
+        self.cost = cost
+        self.workers = workers
+        self.tag = tag
+        self.order = order
+        self.future = future
+
+    def __lt__(self, other: _Ticket) -> bool:
+        return (self.tag, self.order) < (other.tag, other.order)
+
+
+class _Lane:
+    """The fair queue of one lane and the jobs of it that are running"""
+    __slots__ = ('queue', 'finish_tags', 'virtual_time', 'running', 'running_cost')
+
+    def __init__(self) -> None:
+        self.queue: list[_Ticket] = []
+        # the finish tag of the last job admitted per guild
+        self.finish_tags: dict[Optional[int], float] = {}
+        self.virtual_time: float = 0.0
+        # the workers occupied by the lane's running jobs
+        self.running: int = 0
+        self.running_cost: int = 0
+
+    def tag(self, guild: Optional[int], cost: int) -> float:
+        tag = self.finish_tags[guild] = max(self.virtual_time, self.finish_tags.get(guild, 0.0)) + cost
+        return tag
+
+    def start(self, ticket: _Ticket) -> None:
+        self.running += ticket.workers
+        self.running_cost += ticket.cost
+        self.virtual_time = max(self.virtual_time, ticket.tag - ticket.cost)
+
+        if self.finish_tags.get(ticket.guild) == ticket.tag:
+            # nothing else of this guild is queued, its next job starts from the current virtual time
+            del self.finish_tags[ticket.guild]
+
+    def stop(self, ticket: _Ticket) -> None:
+        self.running -= ticket.workers
+        self.running_cost -= ticket.cost
+
+
+class JobScheduler:
+    """Limits the imaging jobs running at once, queuing the rest fairly between guilds
+
+    Parameters
+    ----------
+    max_jobs : int
+        the amount of workers the running jobs may occupy at once
+    max_cost : Optional[int]
+        the summed cost of the slow jobs that may run at once, defaults to 4x `max_jobs`,
+        a job's cost is capped to it so that any job can eventually run
+    max_queued : int
+        the amount of jobs that may wait, further jobs raise `ImagingQueueFull`
+    fast_jobs : Optional[int]
+        the amount of workers only fast jobs may use, defaults to a quarter of `max_jobs` (at least 1),
+        fast jobs may use any free worker and do not count towards `max_cost`
+    """
+
+    def __init__(
+        self,
+        *,
+        max_jobs: int = DEFAULT_WORKERS,
+        max_cost: Optional[int] = None,
+        max_queued: int = 64,
+        fast_jobs: Optional[int] = None,
+    ) -> None:
+        self.max_jobs = max_jobs
+        self.max_cost = max_cost or max_jobs * 4
+        self.max_queued = max_queued
+        # a single worker is shared by both lanes
+        self.fast_jobs = min(max(max_jobs // 4, 1) if fast_jobs is None else fast_jobs, max_jobs - 1)
+
+        self.fast = _Lane()
+        self.slow = _Lane()
+        self._order = itertools.count()
+
+    @property
+    def running(self) -> int:
+        return self.fast.running + self.slow.running
+
+    @property
+    def running_cost(self) -> int:
+        return self.slow.running_cost
+
+    @property
+    def queued(self) -> int:
+        return len(self.fast.queue) + len(self.slow.queue)
+
+    def max_workers(self, fast: bool = False) -> int:
+        """The most workers a single job of the lane may occupy"""
+        return self.max_jobs if fast else self.max_jobs - self.fast_jobs
+
+    def _has_room(self, lane: _Lane, cost: int, workers: int) -> bool:
+        if self.running + workers > self.max_jobs:
+            return False
+        if lane is self.fast:
+            return True
+        return (
+            self.slow.running + workers <= self.max_jobs - self.fast_jobs
+            and self.slow.running_cost + cost <= self.max_cost
+        )
+
+    def _start(self, ticket: _Ticket) -> None:
+        ticket.lane.start(ticket)
+        ticket.future.set_result(None)
+
+    def _dispatch(self) -> None:
+        # only the head of a lane may start so that expensive jobs are not starved by a stream of cheap ones
+        for lane in (self.fast, self.slow):
+            while lane.queue and self._has_room(lane, lane.queue[0].cost, lane.queue[0].workers):
+                ticket = heapq.heappop(lane.queue)
+                if ticket.future.done():
+                    # its task was cancelled and has yet to withdraw it
+                    continue
+                self._start(ticket)
+
+    def _admit(self, guild: Optional[int], cost: int, fast: bool, workers: int) -> _Ticket:
+        lane = self.fast if fast else self.slow
+        cost = min(max(cost, 1), self.max_cost)
+        workers = min(max(workers, 1), self.max_workers(fast))
+        immediate = not lane.queue and self._has_room(lane, cost, workers)
+
+        if not immediate and self.queued >= self.max_queued:
+            raise ImagingQueueFull(self.queued)
+
+        ticket = _Ticket(
+            lane, guild, cost, workers, lane.tag(guild, cost), next(self._order), asyncio.get_running_loop().create_future(),
+        )
+        if immediate:
+            self._start(ticket)
+        else:
+            heapq.heappush(lane.queue, ticket)
+        return ticket
+
+    def _release(self, ticket: _Ticket) -> None:
+        ticket.lane.stop(ticket)
+        self._dispatch()
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        if ticket in (queue := ticket.lane.queue):
+            queue.remove(ticket)
+            heapq.heapify(queue)
+        # the job left may have been the one blocking the head
+        self._dispatch()
+
+    def position(self, ticket: _Ticket) -> int:
+        """The 1-based position of a queued ticket within its lane, 0 once it has started"""
+        if ticket.future.done():
+            return 0
+        return sum(other < ticket for other in ticket.lane.queue) + 1
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self,
+        guild: Optional[int],
+        cost: int = 1,
+        *,
+        fast: bool = False,
+        workers: int = 1,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None,
+    ) -> AsyncIterator[int]:
+        """Waits for the job's turn in its lane and holds its slots while the block runs
+
+        A job split across `workers` workers waits until that many are free,
+        the block gets the amount it may use, `workers` capped to `max_workers`
+
+        `on_queued` is awaited with the job's queue position if it cannot start right away
+        """
+        ticket = self._admit(guild, cost, fast, workers)
+        try:
+            if not ticket.future.done():
+                with span('schedule'):
+                    if on_queued is not None:
+                        await on_queued(self.position(ticket))
+                    await ticket.future
+        except BaseException:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # started while being cancelled
+                self._release(ticket)
+            else:
+                self._withdraw(ticket)
+            raise
+
+        try:
+            yield ticket.workers
+        finally:
+            self._release(ticket)
+
+
+_SCHEDULER: Optional[JobScheduler] = None
+
+def configure_scheduler(
+    *,
+    max_jobs: Optional[int] = None,
+    max_cost: Optional[int] = None,
+    max_queued: int = 64,
+    fast_jobs: Optional[int] = None,
+) -> JobScheduler:
+    """Replaces the scheduler of imaging jobs, jobs already admitted keep running on the previous one"""
+    global _SCHEDULER
+
+    _SCHEDULER = JobScheduler(
+        max_jobs=max_jobs or DEFAULT_WORKERS,
+        max_cost=max_cost,
+        max_queued=max_queued,
+        fast_jobs=fast_jobs,
+    )
+    return _SCHEDULER
+
+def get_scheduler() -> JobScheduler:
+    if _SCHEDULER is None:
+        return configure_scheduler()
+    return _SCHEDULER
@@ -0,0 +1,155 @@
+"""
+Batched shape splatting, used by the lines / balls / squares / letters commands
+
+Every shape is rasterised once by pillow into a small label stamp,
+a frame then resolves which of its (randomly placed) shapes ends up on top of each pixel
+with one grayscale dilation per stamp instead of drawing them one at a time
+"""
+from __future__ import annotations
+
+from typing import Any, Final, Optional, Sequence
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+__all__: tuple[str, ...] = (
+    'FILL',
+    'OUTLINE',
+    'ShapeStamps',
+    'make_stamps',
+    'splat_shapes',
+)
+
+FILL: Final[int] = 1
+OUTLINE: Final[int] = 2
+
+
+class ShapeStamps:
+    """Label masks (`FILL` / `OUTLINE`) of one or more shapes, all sharing the same origin
+
+    Attributes
+    ----------
+    labels : np.ndarray
+        the `(n, h, w)` uint8 label masks
+    origin : tuple[int, int]
+        the `(y, x)` position within the masks that gets placed on a shape's point
+    """
+    __slots__ = ('labels', 'origin', 'kernels')
+
+    def __init__(self, labels: np.ndarray, origin: tuple[int, int]) -> None:
+        self.labels = labels
+        self.origin = origin
+        # the dilation kernels are point reflections of the stamps,
+        # so that each pixel gathers the shapes whose stamp covers it
+        self.kernels = [np.ascontiguousarray((label != 0)[::-1, ::-1]).astype(np.uint8) for label in labels]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def anchor(self) -> tuple[int, int]:
+        """`origin` in reflected kernel coordinates, as `(x, y)` for opencv"""
+        _, h, w = self.labels.shape
+        y, x = self.origin
+        return w - 1 - x, h - 1 - y
+
+
+def make_stamps(
+    method: str,
+    *,
+    size: int = 10,
+    texts: Optional[Sequence[str]] = None,
+    **options: Any,
+) -> ShapeStamps:
+    """Rasterises `ImageDraw.<method>` over the box `size` pixels around a point,
+    once per text in `texts` for `method='text'`
+
+    `outline` (if given) is drawn as `OUTLINE`
+    """
+    span = size * 4 + 1
+    center = size * 2
+    xy = (center - size, center - size, center + size, center + size)
+
+    if options.get('outline') is not None:
+        options['outline'] = OUTLINE
+
+    stamps = []
+    for text in texts or (None,):
+        stamp = Image.new('L', (span, span), 0)
+        cursor = ImageDraw.Draw(stamp)
+        # stamps are binary, so text is rasterised without anti-aliasing
+        cursor.fontmode = '1'
+
+        draw = getattr(cursor, method)
+        if text is not None:
+            options['text'] = text
+
+        draw(xy=xy, fill=FILL, **options)
+        stamps.append(np.asarray(stamp))
+
+    labels = np.stack(stamps)
+
+    # crop to the area any of the stamps cover, opencv needs the origin to stay within it
+    ys, xs = np.nonzero(labels.any(axis=0))
+    top, left = min(ys.min(), center), min(xs.min(), center)
+    bottom, right = max(ys.max(), center), max(xs.max(), center)
+
+    labels = labels[:, top:bottom + 1, left:right + 1]
+    return ShapeStamps(np.ascontiguousarray(labels), (center - top, center - left))
+
+def splat_shapes(
+    img: Image.Image,
+    stamps: ShapeStamps,
+    *,
+    count: int = 10000,
+    outline: tuple[int, int, int, int] = (0, 0, 0, 255),
+) -> Image.Image:
+    """Draws `count` randomly placed shapes (picked from `stamps`) filled with the color of `img` at their point,
+    later shapes are drawn over earlier ones as if they were drawn one by one
+
+    Returns
+    -------
+    Image.Image
+        an RGBA image of the same size as `img`, transparent where no shape landed
+    """
+    pixels = np.asarray(img.convert('RGBA'))
+    h, w, _ = pixels.shape
+
+    ys = np.random.randint(1, h, size=count) if h > 1 else np.zeros(count, dtype=int)
+    xs = np.random.randint(1, w, size=count) if w > 1 else np.zeros(count, dtype=int)
+    kinds = np.random.randint(len(stamps), size=count)
+    # shapes are numbered from 1 in drawing order, 0 is no shape
+    order = np.arange(1, count + 1, dtype=np.float32)
+
+    top = np.zeros((h, w), dtype=np.float32)
+    for kind, kernel in enumerate(stamps.kernels):
+        mask = kinds == kind
+        if not mask.any():
+            continue
+
+        points = np.zeros(h * w, dtype=np.float32)
+        np.maximum.at(points, ys[mask] * w + xs[mask], order[mask])
+        covered = cv2.dilate(
+            points.reshape(h, w), kernel,
+            anchor=stamps.anchor,
+            borderType=cv2.BORDER_CONSTANT,
+            borderValue=0,
+        )
+        np.maximum(top, covered, out=top)
+
+    top = top.astype(np.intp)
+    drawn = top > 0
+    shape = top[drawn] - 1
+
+    # where the pixel lies within the stamp of the shape drawn on top of it
+    py, px = np.nonzero(drawn)
+    oy, ox = stamps.origin
+    labels = stamps.labels[kinds[shape], py - ys[shape] + oy, px - xs[shape] + ox]
+
+    colors = pixels[ys[shape], xs[shape]]
+    colors[labels == OUTLINE] = outline
+
+    base = np.zeros((h, w, 4), dtype=np.uint8)
+    base[drawn] = colors
+    return Image.fromarray(base, 'RGBA')
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from typing import TypeVar, TYPE_CHECKING
+from itertools import accumulate
 
 from wand.image import Image
 from wand.sequence import SingleImage
 
 from ..helpers import get_asset
+from .generator import frame_generator
 from .image import (
     wand_circle_mask,
     wand_image,
@@ -92,7 +94,7 @@ def polaroid(_, img: I) -> I:
     img.polaroid()
     return img
 
-@wand_image()
+@wand_image(cache=False)
 def fuzz(_, img: I, *, intensity: int = 8) -> I:
     img.spread(radius=intensity)
     return img
@@ -124,7 +126,7 @@ def threshold(_, img: I, *, threshold: float = 0.5, channel: str = 'RGB') -> I:
     img.threshold(threshold, channel=channel)
     return img
 
-@wand_image()
+@wand_image(cache=False)
 def noise(_, img: I, *, amount: float = 2) -> I:
     img.noise('laplacian', attenuate=amount)
     return img
@@ -176,79 +178,46 @@ def floor(_, img: I) -> I:
     )
     return img
 
-@wand_image(width=500)
-def increasing_wave(_, img: Image) -> Image:
-    base = Image()
-
-    for i in range(4, 30, 2):
-        with img.clone() as clone:
-            clone.wave(
-                amplitude=img.height / 24,
-                wave_length=img.width / i,
-            )
-            clone.dispose = 'background'
-            base.sequence.append(clone)
-        del clone
-
-    base.sequence.extend(reversed(base.sequence))
-    return base
+@wand_image(width=500, process_all_frames=False)
+@frame_generator(range(4, 30, 2), mirror=True)
+def increasing_wave(_, img: Image, i: int) -> Image:
+    img.wave(
+        amplitude=img.height / 24,
+        wave_length=img.width / i,
+    )
+    return img
 
 @wand_image(width=300, process_all_frames=False)
-def slide(_, img: Image) -> Image:
-    base = Image(background='none')
-
-    for i in range(2, 260, 20):
-        with img.clone() as clone:
-            clone.virtual_pixel = 'horizontal_tile'
-            clone.distort('scale_rotate_translate', (i, 0, 1, 0, 0, 0))
-            clone.distort('plane_2_cylinder', (110,))
-            clone.dispose = 'background'
-            base.sequence.append(clone)
-        del clone
-    return base
+@frame_generator(range(2, 260, 20))
+def slide(_, img: Image, i: int) -> Image:
+    img.virtual_pixel = 'horizontal_tile'
+    img.distort('scale_rotate_translate', (i, 0, 1, 0, 0, 0))
+    img.distort('plane_2_cylinder', (110,))
+    return img
 
 @wand_image(width=400, process_all_frames=False)
-def bulge(_, img: Image) -> Image:
-    base = Image(background='none')
-
-    for i in range(0, -50, -5):
-        with img.clone() as clone:
-            clone.implode(amount=i)
-            clone.dispose = 'background'
-            base.sequence.append(clone)
-        del clone
-
-    base.sequence.extend(reversed(base.sequence))
-    return base
+@frame_generator(range(0, -50, -5), mirror=True)
+def bulge(_, img: Image, i: int) -> Image:
+    img.implode(amount=i)
+    return img
 
 @wand_image(width=400, process_all_frames=False)
-def swirl(_, img: Image) -> Image:
-    base = Image(background='none')
-
-    for i in range(10, 140, 10):
-        img = img.clone()
-        img.swirl(degree=i)
-        img.dispose = 'background'
-        base.sequence.append(img)
-    del img
+# swirls compose additively, each frame swirls 10 degrees more than the last one did
+@frame_generator(tuple(accumulate(range(10, 140, 10))), mirror=True)
+def swirl(_, img: Image, degree: int) -> Image:
+    img.swirl(degree=degree)
+    return img
 
-    base.sequence.extend(reversed(base.sequence))
-    return base
+def _turn_source(_, img: I) -> I:
+    img.rotate(12)
+    return img
 
 @wand_image(width=300, process_all_frames=False)
-def turn(_, img: I) -> I:
-
-    if len(img.sequence) > 1 or img.format.lower() == 'gif':
-        img = Image(img.sequence[0])
-        img.dispose = 'background'
-
-    img.rotate(12)
-    for i in range(12, 360, 12):
-        with img.clone() as clone:
-            clone.rotate(i)
-            clone.dispose = 'background'
-            img.sequence.append(clone)
-        del clone
+# the first frame is the source itself, turned by 12 degrees like the rest
+@frame_generator((0, *range(12, 360, 12)), prepare=_turn_source)
+def turn(_, img: I, angle: int) -> I:
+    if angle:
+        img.rotate(angle)
     return img
 
 @wand_image(width=400)
@@ -283,28 +252,16 @@ def bomb(_, img: I) -> I:
     return img
 
 @wand_image(width=400, process_all_frames=False)
-def cycle_colors(_, img: Image) -> Image:
-    base = Image()
-    for i in range(1, 360, 10):
-        with img.clone() as frame:
-            frame.cycle_color_map(i)
-            frame.delay = 12
-            frame.dispose = 'background'
-            base.sequence.append(frame)
-        del frame
-    return base
+@frame_generator(range(1, 360, 10), delay=120)
+def cycle_colors(_, img: Image, i: int) -> Image:
+    img.cycle_color_map(i)
+    return img
 
 @wand_image(width=400, process_all_frames=False)
-def huerotate(_, img: Image) -> Image:
-    base = Image()
-    for i in range(1, 360, 10):
-        with img.clone() as frame:
-            frame.modulate(hue=i)
-            frame.delay = 14
-            frame.dispose = 'background'
-            base.sequence.append(frame)
-        del frame
-    return base
+@frame_generator(range(1, 360, 10), delay=140)
+def huerotate(_, img: Image, i: int) -> Image:
+    img.modulate(hue=i)
+    return img
 
 @wand_image(process_all_frames=False)
 def spread_cards(_, img: Image) -> Image:
@@ -367,29 +324,14 @@ def slides(_, img: Image) -> Image:
             base.sequence.append(clone)
     return base
 
-@wand_image(width=400)
-def spread_out(_, img: Image) -> Image:
-    base = Image()
-    for i in range(0, 50, 4):
-        with img.clone() as clone:
-            clone.spread(i)
-            base.sequence.append(clone)
-        del clone
-    base.sequence.extend(reversed(base.sequence))
-    return base
+@wand_image(width=400, process_all_frames=False, cache=False)
+@frame_generator(range(0, 50, 4), mirror=True)
+def spread_out(_, img: Image, i: int) -> Image:
+    img.spread(i)
+    return img
 
 @wand_image(width=500, process_all_frames=False)
-def magik(_, img: Image, *, static: bool = False) -> Image:
-    if static:
-        img.liquid_rescale(img.width // 2, img.height // 2, i, i)
-        return img
-    else:
-        base = Image()
-        for i in range(2, 10, 1):
-            with img.clone() as clone:
-                clone.liquid_rescale(img.width // 2, img.height // 2, i, i)
-                clone.dispose = 'background'
-                base.sequence.append(clone)
-            del clone
-        base.sequence.extend(reversed(base.sequence))
-        return base
\ No newline at end of file
+@frame_generator(range(2, 10, 1), mirror=True)
+def magik(_, img: Image, i: int) -> Image:
+    img.liquid_rescale(img.width // 2, img.height // 2, i, i)
+    return img
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+Process-pool backend for the imaging decorators
+
+Jobs are registered by the decorators under a `module:qualname[#name]` key,
+worker processes resolve that key by importing the module themselves,
+so only picklable `(key, bytes, args, kwargs, options)` tuples ever cross the process boundary
+
+Every job also carries a `Deadline`, which frame loops poll through `check_deadline`
+so that timed out jobs stop cooperatively, workers that ignore it are terminated
+
+The stages a job records in a worker are sent back with its result and observed by the parent's `REGISTRY`,
+frames rendered in workers come back as `SharedFrames` (if they fit), which are unlinked if nobody is waiting for them anymore
+"""
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Final,
+    Optional,
+    Callable,
+    Iterator,
+    NamedTuple,
+)
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import multiprocessing
+import contextlib
+import threading
+import importlib
+import asyncio
+import logging
+import pickle
+import weakref
+import time
+import os
+
+import discord
+
+from .exceptions import ImageProcessTimeout
+from .metrics import REGISTRY, StageTimings, collect_stages, record
+from .framebuffer import SharedFrames
+
+__all__: tuple[str, ...] = (
+    'Deadline',
+    'job_deadline',
+    'check_deadline',
+    'EncodedFile',
+    'job_key',
+    'register_job',
+    'get_job',
+    'is_picklable',
+    'start_process_pool',
+    'shutdown_process_pool',
+    'restart_process_pool',
+    'get_process_pool',
+    'pool_size',
+    'run_in_process',
+)
+
+DEFAULT_WORKERS: Final[int] = max((os.cpu_count() or 2) - 1, 1)
+KILL_GRACE: Final[float] = 5.0
+
+_JOBS: dict[str, Callable[..., Any]] = {}
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS: Optional[int] = None
+# guards `_POOL` being replaced between a job checking for it and submitting to it
+_POOL_LOCK = threading.RLock()
+# runs jobs submitted while the pool was being shut down
+_FALLBACK: Optional[ThreadPoolExecutor] = None
+# futures cancelled because their pool was shut down, rather than by their caller
+_TORN_DOWN: weakref.WeakSet[Future] = weakref.WeakSet()
+
+_local = threading.local()
+_log = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Cooperative cancellation state of a single imaging job
+
+    `expires` is wall-clock time so that it stays meaningful across processes
+    """
+    __slots__ = ('timeout', 'expires', 'cancelled')
+
+    def __init__(self, timeout: int, *, expires: Optional[float] = None) -> None:
+        self.timeout = timeout
+        self.expires = expires or time.time() + timeout
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self) -> None:
+        if self.cancelled or time.time() > self.expires:
+            raise ImageProcessTimeout(self.timeout)
+
+@contextlib.contextmanager
+def job_deadline(deadline: Deadline) -> Iterator[Deadline]:
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+def check_deadline() -> None:
+    """Raises `ImageProcessTimeout` if the job running on this thread was cancelled or timed out,
+    meant to be called between frames
+    """
+    if (deadline := getattr(_local, 'deadline', None)) is not None:
+        deadline.check()
+
+
+class JobResult(NamedTuple):
+    value: Any
+    stages: StageTimings
+
+
+class EncodedFile(NamedTuple):
+    """A picklable stand-in for `discord.File`, returned from worker processes"""
+    data: bytes
+    filename: str
+
+    @classmethod
+    def from_file(cls, file: discord.File) -> EncodedFile:
+        return cls(file.fp.getvalue(), file.filename)
+
+    def to_file(self) -> discord.File:
+        return discord.File(BytesIO(self.data), self.filename)
+
+
+def job_key(func: Callable[..., Any], name: Optional[str] = None) -> str:
+    key = f'{func.__module__}:{func.__qualname__}'
+    return f'{key}#{name}' if name else key
+
+def register_job(func: Callable[..., Any], job: Callable[..., Any], *, name: Optional[str] = None) -> str:
+    """Registers `job` under the key of `func`, `name` tells apart multiple jobs of the same function"""
+    key = job_key(func, name)
+    _JOBS[key] = job
+    return key
+
+def is_picklable(*objects: Any) -> bool:
+    try:
+        pickle.dumps(objects)
+    except Exception:
+        return False
+    else:
+        return True
+
+def _resolve_job(key: str) -> Callable[..., Any]:
+    if key not in _JOBS:
+        module, _, _ = key.partition(':')
+        importlib.import_module(module)
+    return _JOBS[key]
+
+def get_job(key: str) -> Optional[Callable[..., Any]]:
+    """The job registered under `key`, importing its module if needed, `None` if there is none"""
+    try:
+        return _resolve_job(key)
+    except KeyError:
+        return None
+
+def _init_worker(modules: tuple[str, ...]) -> None:
+    for module in modules:
+        importlib.import_module(module)
+
+def _run_job(
+    key: str,
+    data: bytes,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    options: Any,
+    timeout: int,
+    expires: float,
+    submitted: float,
+) -> JobResult:
+    job = _resolve_job(key)
+
+    with job_deadline(Deadline(timeout, expires=expires)), collect_stages() as stages:
+        record('queue', time.time() - submitted)
+        result = job(None, BytesIO(data), args, kwargs, options)
+
+    if isinstance(result, discord.File):
+        result = EncodedFile.from_file(result)
+    return JobResult(result, stages)
+
+
+def start_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Starts the worker pool used by `pil_image` / `wand_image`,
+    jobs fall back to threads while no pool is running
+    """
+    global _POOL, _POOL_WORKERS
+
+    with _POOL_LOCK:
+        if _POOL is not None:
+            return _POOL
+
+        modules = tuple({key.partition(':')[0] for key in _JOBS})
+
+        _POOL_WORKERS = max_workers or DEFAULT_WORKERS
+        _POOL = ProcessPoolExecutor(
+            max_workers=_POOL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(modules,),
+        )
+        return _POOL
+
+def shutdown_process_pool(*, wait: bool = False) -> None:
+    global _POOL
+
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+
+    if pool is not None:
+        _shutdown(pool, wait=wait)
+
+def _shutdown(pool: ProcessPoolExecutor, *, wait: bool) -> None:
+    """Shuts `pool` down, marking the jobs it cancels so that `run_in_process` can tell them apart"""
+    for work in list(getattr(pool, '_pending_work_items', {}).values()):
+        _TORN_DOWN.add(work.future)
+    pool.shutdown(wait=wait, cancel_futures=True)
+
+def restart_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Replaces the running pool (if any), so that workers pick up reloaded modules"""
+    with _POOL_LOCK:
+        if _POOL is None:
+            return None
+
+        shutdown_process_pool()
+        return start_process_pool(_POOL_WORKERS)
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    return _POOL
+
+def pool_size() -> int:
+    """The amount of workers of the running pool, 0 if none is running"""
+    if _POOL is None:
+        return 0
+    return _POOL_WORKERS or 0
+
+def _terminate_pool(pool: ProcessPoolExecutor) -> None:
+    """Kills every worker of `pool`, replacing it first if it is the running pool
+
+    This takes down every job running on `pool`, not only the stuck one:
+    `ProcessPoolExecutor` breaks as a whole as soon as any of its workers dies, so killing just the stuck
+    worker's PID would not spare the others. Those jobs fail with `BrokenProcessPool` and are resubmitted
+    once by `run_in_process` to the new pool, restarting from scratch within their original deadline
+    """
+    global _POOL
+
+    with _POOL_LOCK:
+        if pool is _POOL:
+            _POOL = None
+            start_process_pool(_POOL_WORKERS)
+
+    for process in list(getattr(pool, '_processes', {}).values()):
+        process.terminate()
+    _shutdown(pool, wait=False)
+
+def _reap_job(future: Future, pool: Optional[ProcessPoolExecutor]) -> None:
+    if pool is not None and not future.done():
+        running = sum(not work.future.done() for work in list(getattr(pool, '_pending_work_items', {}).values()))
+        _log.warning(
+            f'imaging worker ignored its deadline, terminating the process pool '
+            f'along with the {max(running - 1, 0)} other jobs in it'
+        )
+        _terminate_pool(pool)
+
+def _ignore_outcome(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+def _submit(*args: Any) -> tuple[Future, Optional[ProcessPoolExecutor]]:
+    """Submits `_run_job(*args)` to the running pool, or to a thread if the pool was shut down meanwhile"""
+    global _FALLBACK
+
+    with _POOL_LOCK:
+        if (pool := _POOL) is not None:
+            return pool.submit(_run_job, *args), pool
+
+        if _FALLBACK is None:
+            _FALLBACK = ThreadPoolExecutor(thread_name_prefix='imaging-fallback')
+        return _FALLBACK.submit(_run_job, *args), None
+
+def _discard_result(future: Future) -> None:
+    """Frees the shared memory of a result that arrived after its job was abandoned"""
+    if not future.cancelled() and future.exception() is None and isinstance(future.result().value, SharedFrames):
+        future.result().value.unlink()
+
+async def run_in_process(
+    key: str,
+    data: bytes,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    *,
+    options: Any = None,
+    timeout: int = 600,
+) -> Any:
+    loop = asyncio.get_running_loop()
+    expires = time.time() + timeout
+
+    for attempt in range(2):
+        future, pool = _submit(key, data, args, kwargs, options, timeout, expires, time.time())
+        waiter = asyncio.wrap_future(future)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(waiter), timeout=max(expires - time.time(), 0))
+        except asyncio.TimeoutError as exc:
+            # its outcome is of no interest anymore, e.g. `BrokenProcessPool` once it is reaped
+            waiter.add_done_callback(_ignore_outcome)
+            if not future.cancel():
+                future.add_done_callback(_discard_result)
+                loop.call_later(KILL_GRACE, _reap_job, future, pool)
+            raise ImageProcessTimeout(timeout) from exc
+        except asyncio.CancelledError:
+            if future.cancelled() and future in _TORN_DOWN and not attempt and _POOL is not pool:
+                # not started yet when the pool was torn down by another job's timeout, retry it on the replacement
+                continue
+            # e.g. a sibling frame chunk failed, jobs that already started run until their deadline
+            waiter.add_done_callback(_ignore_outcome)
+            if not future.cancel():
+                future.add_done_callback(_discard_result)
+            raise
+        except BrokenProcessPool:
+            # the pool was torn down by another job's timeout, retry once on its replacement
+            if attempt or _POOL is pool:
+                raise
+        else:
+            break
+
+    result, stages = result
+    REGISTRY.observe_stages(stages)
+
+    if isinstance(result, EncodedFile):
+        result = result.to_file()
+    return result
@@ -0,0 +1,59 @@
+"""
+Tests of the streaming frame pipeline
+"""
+from __future__ import annotations
+
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageSequence
+
+try:
+    import wand.image  # noqa: F401
+except (ImportError, OSError):
+    # wand raises `OSError` when ImageMagick itself is not installed
+    pytest.skip('the pipeline needs wand and ImageMagick', allow_module_level=True)
+
+from bot.utils.imaging.pipeline import _split_gif
+
+# the NETSCAPE2.0 looping extension, looping forever
+LOOP_EXTENSION = b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'
+
+
+def _encode_gif(delays: list[int]) -> bytes:
+    frames = [Image.new('P', (4, 4), index) for index in range(len(delays))]
+    for frame in frames:
+        frame.putpalette([channel for index in range(len(delays)) for channel in (index * 40, 0, 0)])
+
+    output = BytesIO()
+    frames[0].save(output, 'GIF', save_all=True, append_images=frames[1:], duration=delays, loop=0, optimize=False)
+    return output.getvalue()
+
+def _gce_before_loop_extension(data: bytes) -> bytes:
+    """Moves the looping extension after the first frame's graphic control extension, the order ImageMagick writes"""
+    data = data.replace(LOOP_EXTENSION, b'', 1)
+    gce = data.index(b'\x21\xf9')
+    # a graphic control extension is 8 bytes long
+    return data[:gce + 8] + LOOP_EXTENSION + data[gce + 8:]
+
+def _delays(data: bytes) -> list[int]:
+    with Image.open(BytesIO(data)) as image:
+        return [frame.info['duration'] for frame in ImageSequence.Iterator(image)]
+
+
+@pytest.mark.parametrize('imagemagick_order', [False, True])
+def test_split_gif_mirror_round_trip(imagemagick_order: bool) -> None:
+    delays = [30, 50, 70]
+    data = _encode_gif(delays)
+    if imagemagick_order:
+        data = _gce_before_loop_extension(data)
+
+    header, frames, trailer = _split_gif(data)
+
+    if not imagemagick_order:
+        assert header + b''.join(frames) + trailer == data
+    assert LOOP_EXTENSION in header
+    assert all(frame.startswith(b'\x21\xf9') for frame in frames)
+
+    mirrored = header + b''.join(frames) + b''.join(reversed(frames)) + trailer
+    assert _delays(mirrored) == delays + delays[::-1]